@@ -0,0 +1,197 @@
+# coding: utf-8
+# vim: set ts=4 sw=4 et:
+
+"""
+Catch-up of existing content of followed files.
+
+When a file is followed from the beginning, its rotated siblings (app.log.2,
+app.log.1.gz, app.log.1, ...) are shipped first, oldest first, followed by
+the file itself. When the file has been rotated while the agent was not
+running, only siblings written after the last checkpoint are shipped,
+starting at the checkpointed offset. Content is read in large blocks,
+compressed siblings are decompressed as a stream with bounded memory, and
+the progress is reported in regular intervals.
+"""
+
+import errno
+import logging
+import os
+import re
+import time
+import zlib
+
+__author__ = 'Logentries'
+
+__all__ = ['rotated_siblings', 'unsent_siblings', 'read_blocks', 'read_siblings', 'Throughput']
+
+LOG_LE_AGENT = 'logentries.com'
+log = logging.getLogger(LOG_LE_AGENT)
+
+# Time between progress reports
+REPORT_INTERVAL = 10  # Seconds
+
+# Suffix of rotated files, number and optional compression
+ROTATED_SUFFIX = r'\.(\d+)(\.gz)?$'
+
+# Window bits for zlib to decode gzip streams
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def rotated_siblings(path):
+    """Returns paths of rotated siblings of the file, oldest first. If a
+    sibling exists both compressed and uncompressed, the uncompressed one is
+    used."""
+    dirname, basename = os.path.split(path)
+    pattern = re.compile(re.escape(basename) + ROTATED_SUFFIX)
+    try:
+        names = os.listdir(dirname or os.curdir)
+    except os.error, e:
+        log.warning("Cannot list rotated files of %s: %s", path, e.strerror)
+        return []
+
+    siblings = {}  # number -> name
+    for name in names:
+        m = pattern.match(name)
+        if m and (not m.group(2) or int(m.group(1)) not in siblings):
+            siblings[int(m.group(1))] = name
+    return [os.path.join(dirname, siblings[x]) for x in sorted(siblings, reverse=True)]
+
+
+def _read_plain(f, size):
+    while True:
+        buff = f.read(size)
+        if not buff:
+            break
+        yield buff
+
+
+def _read_gzip(f, size):
+    """Decompresses the gzip stream, neither compressed nor decompressed
+    blocks are larger than size. Concatenated gzip members are supported."""
+    decoder = zlib.decompressobj(GZIP_WBITS)
+    data = ''
+    while True:
+        if not data:
+            data = f.read(size)
+            if not data:
+                break
+        buff = decoder.decompress(data, size)
+        if decoder.unused_data:
+            # End of a member, another one follows
+            data = decoder.unused_data
+            decoder = zlib.decompressobj(GZIP_WBITS)
+        else:
+            data = decoder.unconsumed_tail
+        if buff:
+            yield buff
+    buff = decoder.flush()
+    if buff:
+        yield buff
+
+
+def read_blocks(path, size, skip=0):
+    """Generates blocks of the file content, decompressed if the file is
+    compressed with gzip. The first skip bytes of the content are left
+    out."""
+    try:
+        f = open(path, 'rb')
+    except IOError, e:
+        if e.errno != errno.ENOENT:
+            log.warning("Cannot read %s: %s", path, e.strerror)
+        return
+    try:
+        if path.endswith('.gz'):
+            blocks = _read_gzip(f, size)
+        else:
+            f.seek(skip)
+            skip = 0
+            blocks = _read_plain(f, size)
+        try:
+            for buff in blocks:
+                if skip:
+                    if len(buff) <= skip:
+                        skip -= len(buff)
+                        continue
+                    buff = buff[skip:]
+                    skip = 0
+                yield buff
+        except zlib.error, e:
+            log.warning("Cannot decompress %s: %s", path, e)
+        except IOError, e:
+            log.warning("Cannot read %s: %s", path, e.strerror)
+    finally:
+        f.close()
+
+
+def unsent_siblings(path, checkpoint):
+    """Returns list of (path, offset) of rotated siblings which have not been
+    sent completely according to the checkpoint (st_dev, st_ino, offset,
+    updated) of a file previously found under the path, oldest first."""
+    dev, ino, offset, updated = checkpoint
+    siblings = []
+    for sibling in rotated_siblings(path):
+        try:
+            st = os.stat(sibling)
+        except os.error:
+            continue
+        if (st.st_dev, st.st_ino) == (dev, ino):
+            # The checkpointed file itself, forget older ones
+            siblings = [(sibling, offset)]
+        elif st.st_mtime >= updated:
+            siblings.append((sibling, 0))
+    if siblings and siblings[0][1] == 0:
+        # Compressed copies have different inodes, the oldest file written
+        # after the checkpoint is assumed to be the checkpointed one
+        siblings[0] = (siblings[0][0], offset)
+    return siblings
+
+
+def read_siblings(path, size, checkpoint=None, done=None):
+    """Generates blocks of rotated siblings of the file, oldest first. With
+    the checkpoint, only content written after it is generated. An empty
+    block marks the end of each sibling. Before it, done is called with
+    (st_dev, st_ino, st_mtime, offset) of the sibling, offset being the
+    length of its content read."""
+    if checkpoint:
+        siblings = unsent_siblings(path, checkpoint)
+    else:
+        siblings = [(x, 0) for x in rotated_siblings(path)]
+    for sibling, skip in siblings:
+        log.info("Catching up %s", sibling)
+        try:
+            st = os.stat(sibling)
+        except os.error:
+            st = None
+        offset = skip
+        for buff in read_blocks(sibling, size, skip):
+            offset += len(buff)
+            yield buff
+        if done and st:
+            done(st.st_dev, st.st_ino, st.st_mtime, offset)
+        yield ''
+
+
+class Throughput(object):
+    """Reports progress of a catch-up."""
+
+    def __init__(self, name):
+        self._name = name
+        self._started = time.time()
+        self._next_report = self._started + REPORT_INTERVAL
+        self._bytes = 0
+
+    def _rate(self, now):
+        return self._bytes / max(now - self._started, 0.001) / 1048576
+
+    def add(self, size):
+        self._bytes += size
+        now = time.time()
+        if now >= self._next_report:
+            self._next_report = now + REPORT_INTERVAL
+            log.info("Catching up %s: %.1f MB sent, %.1f MB/s",
+                     self._name, self._bytes / 1048576.0, self._rate(now))
+
+    def done(self):
+        now = time.time()
+        log.info("Caught up %s: %.1f MB in %.1fs, %.1f MB/s",
+                 self._name, self._bytes / 1048576.0, now - self._started, self._rate(now))
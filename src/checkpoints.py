@@ -0,0 +1,158 @@
+# coding: utf-8
+# vim: set ts=4 sw=4 et:
+
+"""
+Persistent read offsets of followed files.
+
+Offsets are kept in memory and written to disk by a timer, so that following
+a busy file does not cost a disk write per block. Each record is keyed by
+device, inode and path of the file, the offset is used only if the file found
+under the path on restart is still the same one.
+
+The file contains one record per line:
+    device inode offset updated path
+"""
+
+import errno
+import logging
+import os
+import threading
+import time
+
+__author__ = 'Logentries'
+
+__all__ = ['CheckpointStore']
+
+LOG_LE_AGENT = 'logentries.com'
+log = logging.getLogger(LOG_LE_AGENT)
+
+# Records of files not followed for this long are dropped
+CHECKPOINT_EXPIRY = 7 * 24 * 3600  # Seconds
+
+
+class CheckpointStore(object):
+    """Keeps the last shipped offset for each followed file."""
+
+    def __init__(self, filename, interval, scheduler=None):
+        self._filename = filename
+        self._scheduler = scheduler
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._offsets = {}  # (dev, ino, path) -> [offset, updated]
+        self._dirty = False
+        self._error_info = True
+        self._shutdown = False
+        self._timer = None
+        self._load()
+        self._schedule()
+
+    def _load(self):
+        try:
+            f = open(self._filename)
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                log.warning("Cannot read checkpoints from %s: %s", self._filename, e.strerror)
+            return
+        try:
+            for line in f:
+                try:
+                    dev, ino, offset, updated, path = line.rstrip('\n').split(' ', 4)
+                    self._offsets[(int(dev), int(ino), path)] = [int(offset), float(updated)]
+                except ValueError:
+                    log.debug("Ignoring malformed checkpoint record: %s", line.strip())
+        finally:
+            f.close()
+
+    def _schedule(self):
+        if self._shutdown:
+            return
+        if self._scheduler:
+            self._timer = self._scheduler.call_later(self._interval, self._flush_periodically)
+        else:
+            self._timer = threading.Timer(self._interval, self._flush_periodically, ())
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_periodically(self):
+        self.flush()
+        self._schedule()
+
+    def get(self, dev, ino, path):
+        """Returns the offset recorded for the file or None."""
+        self._lock.acquire()
+        try:
+            record = self._offsets.get((dev, ino, path))
+        finally:
+            self._lock.release()
+        if record:
+            return record[0]
+        return None
+
+    def find(self, path):
+        """Returns (dev, ino, offset, updated) of the most recently updated
+        record of the path or None."""
+        found = None
+        self._lock.acquire()
+        try:
+            for key, record in self._offsets.iteritems():
+                if key[2] == path and (not found or record[1] > found[3]):
+                    found = (key[0], key[1], record[0], record[1])
+        finally:
+            self._lock.release()
+        return found
+
+    def update(self, dev, ino, path, offset, updated=None):
+        """Records the offset of the file, it is written to disk later. The
+        record is dated now unless updated is given."""
+        if updated is None:
+            updated = time.time()
+        self._lock.acquire()
+        try:
+            self._offsets[(dev, ino, path)] = [offset, updated]
+            self._dirty = True
+        finally:
+            self._lock.release()
+
+    def flush(self):
+        """Writes records to disk if they have changed since the last flush.
+        The file is replaced atomically so a crash leaves either the old or
+        the new version."""
+        self._lock.acquire()
+        try:
+            if not self._dirty:
+                return
+            expiry = time.time() - CHECKPOINT_EXPIRY
+            for key, record in self._offsets.items():
+                if record[1] < expiry:
+                    del self._offsets[key]
+            lines = ['%d %d %d %f %s\n' % (key[0], key[1], record[0], record[1], key[2])
+                     for key, record in self._offsets.iteritems()]
+            self._dirty = False
+        finally:
+            self._lock.release()
+
+        tmp_filename = self._filename + '.tmp'
+        try:
+            f = open(tmp_filename, 'w')
+            try:
+                f.write(''.join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                f.close()
+            os.rename(tmp_filename, self._filename)
+            self._error_info = True
+        except (IOError, OSError), e:
+            if self._error_info:
+                log.warning("Cannot write checkpoints to %s: %s", self._filename, e.strerror)
+                self._error_info = False
+            self._lock.acquire()
+            self._dirty = True
+            self._lock.release()
+
+    def close(self):
+        self._shutdown = True
+        t = self._timer
+        if t:
+            t.cancel()
+        self.flush()
@@ -0,0 +1,120 @@
+# coding: utf-8
+# vim: set ts=4 sw=4 et:
+
+"""
+Bounded pool of connections shared by transports.
+
+Logs identified by a log key are sent over HTTP PUT streams, so a connection
+carries entries of a single log. Instead of each transport keeping its own
+thread and connection open, a fixed number of pool threads serve transports
+which have entries queued. A transport connects when it is served, and its
+connection is closed after it has been idle for a while, or sooner if other
+transports wait for a connection.
+
+Transports driven by the pool implement:
+    serve(pool) sends queued entries until it is idle, closes the connection
+        and returns.
+    pending() returns True if there are entries to send.
+"""
+
+import collections
+import logging
+import threading
+import time
+import traceback
+
+__author__ = 'Logentries'
+
+__all__ = ['ConnectionPool']
+
+LOG_LE_AGENT = 'logentries.com'
+log = logging.getLogger(LOG_LE_AGENT)
+
+
+class ConnectionPool(object):
+    """Serves transports with at most size connections at a time."""
+
+    def __init__(self, size, idle_timeout, hold_time):
+        self.idle_timeout = idle_timeout
+        self.hold_time = hold_time
+        self._cond = threading.Condition(threading.Lock())
+        self._ready = collections.deque()  # Transports waiting, oldest first
+        self._serving = set()
+        self._shutdown = False
+        self._threads = []
+        for i in range(max(size, 1)):
+            t = threading.Thread(target=self.run, name='connection-pool-%d' % i)
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def notify(self, transport):
+        """Called by the transport when an entry has been queued."""
+        self._cond.acquire()
+        try:
+            if transport not in self._serving and transport not in self._ready:
+                self._ready.append(transport)
+                self._cond.notify()
+        finally:
+            self._cond.release()
+
+    def waiting(self):
+        """Returns True if a transport waits for a connection."""
+        return bool(self._ready)
+
+    def wait(self, transport, timeout):
+        """Waits until the transport is not served, used when closing it."""
+        self._cond.acquire()
+        try:
+            if transport in self._ready:
+                self._ready.remove(transport)
+            deadline = time.time() + timeout
+            while transport in self._serving and time.time() < deadline:
+                self._cond.wait(deadline - time.time())
+        finally:
+            self._cond.release()
+
+    def _next(self):
+        self._cond.acquire()
+        try:
+            while not self._ready and not self._shutdown:
+                self._cond.wait(1)
+            if self._shutdown:
+                return None
+            transport = self._ready.popleft()
+            self._serving.add(transport)
+            return transport
+        finally:
+            self._cond.release()
+
+    def _done(self, transport):
+        self._cond.acquire()
+        try:
+            self._serving.discard(transport)
+            # Entries queued while the connection was being closed
+            if transport.pending():
+                self._ready.append(transport)
+            self._cond.notify_all()
+        finally:
+            self._cond.release()
+
+    def run(self):
+        while True:
+            transport = self._next()
+            if not transport:
+                break
+            try:
+                transport.serve(self)
+            except Exception:
+                log.error("Exception in connection pool: %s", traceback.format_exc())
+            self._done(transport)
+
+    def close(self):
+        self._cond.acquire()
+        try:
+            self._shutdown = True
+            self._cond.notify_all()
+        finally:
+            self._cond.release()
+        for t in self._threads:
+            t.join(1.0)
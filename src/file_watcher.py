@@ -0,0 +1,247 @@
+# coding: utf-8
+# vim: set ts=4 sw=4 et:
+
+"""
+File change notifications based on Linux inotify.
+
+A single inotify instance is shared by all followers. A background thread
+reads kernel events and wakes up listeners registered for the affected files.
+Listeners are also woken up periodically so they can run their regular
+rename and truncation checks, which keeps them working on file systems that
+do not deliver inotify events (NFS and similar).
+"""
+
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+__author__ = 'Logentries'
+
+__all__ = ['FileNotifier', 'Wakeup', 'inotify_available',
+           'IN_MODIFY', 'IN_ATTRIB', 'IN_CLOSE_WRITE', 'IN_MOVED_FROM', 'IN_MOVED_TO', 'IN_CREATE', 'IN_DELETE',
+           'IN_DELETE_SELF', 'IN_MOVE_SELF', 'IN_Q_OVERFLOW', 'IN_IGNORED',
+           'FILE_EVENTS', 'DIR_EVENTS', 'RENAME_EVENTS']
+
+LOG_LE_AGENT = 'logentries.com'
+log = logging.getLogger(LOG_LE_AGENT)
+
+# Event masks, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_MASK_ADD = 0x20000000
+
+# Events watched on followed files
+FILE_EVENTS = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVE_SELF | IN_DELETE_SELF
+# Events watched on directories of followed files
+DIR_EVENTS = IN_CREATE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+# Events after which the followed name may point to a different file
+RENAME_EVENTS = DIR_EVENTS | IN_MOVE_SELF | IN_DELETE_SELF | IN_Q_OVERFLOW | IN_IGNORED
+
+# struct inotify_event {int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[];}
+EVENT_HEADER = '=iIII'
+EVENT_HEADER_SIZE = struct.calcsize(EVENT_HEADER)
+
+# Size of the buffer for reading events
+EVENT_BUFFER_SIZE = 65536
+
+try:
+    import ctypes
+    import ctypes.util
+
+    _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    _inotify_init = _libc.inotify_init
+    _inotify_add_watch = _libc.inotify_add_watch
+    _inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    _inotify_rm_watch = _libc.inotify_rm_watch
+    _inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    inotify_available = True
+except (ImportError, OSError, AttributeError, TypeError):
+    # Not Linux or ctypes is not available (Python 2.4)
+    inotify_available = False
+
+
+def _os_error():
+    err = ctypes.get_errno()
+    return OSError(err, os.strerror(err))
+
+
+class Wakeup(object):
+    """Notification listener which lets a thread sleep until there is
+    activity on its files or until the next notifier tick."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._mask = 0
+
+    def notify(self, mask):
+        self._lock.acquire()
+        try:
+            self._mask |= mask
+        finally:
+            self._lock.release()
+        self._event.set()
+
+    def wait(self):
+        """Blocks until woken up. Returns the mask of events collected since
+        the last call, 0 for a plain tick."""
+        self._event.wait()
+        self._event.clear()
+        self._lock.acquire()
+        try:
+            mask = self._mask
+            self._mask = 0
+        finally:
+            self._lock.release()
+        return mask
+
+
+class FileNotifier(object):
+    """Shared inotify instance. Listeners are objects with notify(mask)
+    method, they are called from the notifier thread."""
+
+    def __init__(self, tick):
+        self._tick = tick
+        self._fd = _inotify_init()
+        if self._fd < 0:
+            raise _os_error()
+        self._lock = threading.Lock()
+        self._watches = {}  # wd -> {listener: mask}
+        self._listeners = set()
+        self._shutdown = False
+
+        self._worker = threading.Thread(target=self.run, name='file-notifier')
+        self._worker.daemon = True
+        self._worker.start()
+
+    def subscribe(self, listener):
+        """Registers the listener for periodic ticks."""
+        self._lock.acquire()
+        try:
+            self._listeners.add(listener)
+        finally:
+            self._lock.release()
+
+    def unsubscribe(self, listener):
+        self._lock.acquire()
+        try:
+            self._listeners.discard(listener)
+        finally:
+            self._lock.release()
+
+    def add(self, path, mask, listener):
+        """Starts watching the path given on behalf of the listener. Returns
+        the watch descriptor. Raises OSError if the path cannot be watched.
+        Multiple listeners may watch the same file."""
+        wd = _inotify_add_watch(self._fd, path, mask | IN_MASK_ADD)
+        if wd < 0:
+            raise _os_error()
+        self._lock.acquire()
+        try:
+            listeners = self._watches.setdefault(wd, {})
+            listeners[listener] = listeners.get(listener, 0) | mask
+        finally:
+            self._lock.release()
+        return wd
+
+    def remove(self, wd, listener):
+        """Stops watching the descriptor given on behalf of the listener."""
+        self._lock.acquire()
+        try:
+            listeners = self._watches.get(wd)
+            if listeners is None or listener not in listeners:
+                return
+            del listeners[listener]
+            if not listeners:
+                del self._watches[wd]
+                _inotify_rm_watch(self._fd, wd)
+        finally:
+            self._lock.release()
+
+    def _read_events(self):
+        """Reads pending events and returns them as a list of (wd, mask)."""
+        try:
+            buff = os.read(self._fd, EVENT_BUFFER_SIZE)
+        except OSError, e:
+            if e.errno in (errno.EINTR, errno.EAGAIN):
+                return []
+            raise
+        events = []
+        pos = 0
+        while pos + EVENT_HEADER_SIZE <= len(buff):
+            wd, mask, cookie, name_len = struct.unpack_from(EVENT_HEADER, buff, pos)
+            events.append((wd, mask))
+            pos += EVENT_HEADER_SIZE + name_len
+        return events
+
+    def _dispatch(self, events):
+        """Collects listeners affected by the events and notifies them."""
+        notify = {}
+        self._lock.acquire()
+        try:
+            for wd, mask in events:
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost, everybody has to check their files
+                    for listener in self._listeners:
+                        notify[listener] = notify.get(listener, 0) | mask
+                    continue
+                listeners = self._watches.get(wd)
+                if not listeners:
+                    continue
+                for listener, watched in listeners.items():
+                    if mask & (watched | IN_IGNORED):
+                        notify[listener] = notify.get(listener, 0) | mask
+                if mask & IN_IGNORED:
+                    # The watch has been removed by the kernel (file deleted)
+                    del self._watches[wd]
+        finally:
+            self._lock.release()
+
+        for listener, mask in notify.items():
+            listener.notify(mask)
+
+    def _tick_all(self):
+        self._lock.acquire()
+        try:
+            listeners = list(self._listeners)
+        finally:
+            self._lock.release()
+        for listener in listeners:
+            listener.notify(0)
+
+    def run(self):
+        next_tick = time.time() + self._tick
+        while not self._shutdown:
+            try:
+                ready = select.select([self._fd], [], [], max(next_tick - time.time(), 0))[0]
+            except select.error, e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            if ready:
+                self._dispatch(self._read_events())
+            # Ticks are time based so that busy files do not starve idle ones
+            if time.time() >= next_tick:
+                self._tick_all()
+                next_tick = time.time() + self._tick
+
+    def close(self):
+        self._shutdown = True
+        self._worker.join(self._tick + 0.5)
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
@@ -3,10 +3,29 @@
 
 __author__ = 'Logentries'
 
-__all__ = ['FormatPlain', 'FormatSyslog']
+__all__ = ['FormatPlain', 'FormatSyslog', 'FormatJSON', 'JSONConfig']
 
-import datetime
+import ConfigParser
+import re
 import socket
+import time
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+# Configuration parameters of log sections
+FORMAT = 'format'
+FORMAT_JSON = 'json'
+JSON_PREFIX = 'json-'
+JSON_KV = 'kv'
+JSON_PATTERN = 'pattern'
+JSON_PASSTHROUGH = 'passthrough'
+JSON_DROP = 'drop'
+
+# Key=value pairs, values may be double quoted
+KV_PATTERN = re.compile(r'([A-Za-z_][\w.-]*)=("(?:[^"\\]|\\.)*"|[^\s,;]*)', re.UNICODE)
 
 
 class FormatPlain(object):
@@ -18,12 +37,44 @@ class FormatPlain(object):
     def format_line(self, line):
         return self._token + line
 
+    def format_lines(self, lines):
+        token = self._token
+        return [token + line for line in lines]
+
+    def format_block(self, lines):
+        """Returns the formatted lines joined into one string."""
+        return self._token + self._token.join(lines)
+
+
+class _Clock(object):
+    """Current time in ISO format without the zone, with millisecond
+    precision. The time is formatted at most once per millisecond."""
+
+    def __init__(self):
+        self._timestamp = (None, None)  # (millisecond, formatted timestamp)
+
+    def now(self):
+        now = time.time()
+        millis = int(now * 1000)
+        cached = self._timestamp
+        if cached[0] == millis:
+            return cached[1]
+        timestamp = '%s.%03d' % (time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(millis // 1000)), millis % 1000)
+        self._timestamp = (millis, timestamp)
+        return timestamp
+
 
 class FormatSyslog(object):
-    SYSLOG_MSG_FORMAT = '%s<14>1 %sZ %s %s - %s - hostname=%s appname=%s %s'
+    # Header of a message is the prefix, timestamp and suffix
+    SYSLOG_PREFIX_FORMAT = '%s<14>1 '
+    SYSLOG_SUFFIX_FORMAT = 'Z %s %s - %s - hostname=%s appname=%s '
 
     """Formats lines according to Syslog format RFC 5424. Hostname is taken
-    from configuration or current hostname is used."""
+    from configuration or current hostname is used.
+
+    Parts of the header around the timestamp are built once for each message
+    id and token. The timestamp has millisecond precision and is formatted at
+    most once per millisecond."""
 
     def __init__(self, hostname, appname, token, send_datahub=False):
         if hostname:
@@ -33,20 +84,163 @@ class FormatSyslog(object):
         self._appname = appname
         self._token = token
         self.send_datahub = send_datahub
+        self._headers = {}  # (msgid, token) -> (prefix, suffix)
+        self._now = _Clock().now
+
+    def _header(self, msgid, token):
+        """Returns parts of the header before and after the timestamp."""
+        header = self._headers.get((msgid, token))
+        if not header:
+            if self.send_datahub:
+                token_str_param = ''
+            else:
+                token_str_param = token or self._token
+            prefix = FormatSyslog.SYSLOG_PREFIX_FORMAT % token_str_param
+            suffix = FormatSyslog.SYSLOG_SUFFIX_FORMAT % (
+                self._hostname, self._appname,
+                msgid,
+                self._hostname, self._appname)
+            header = self._headers[(msgid, token)] = (prefix, suffix)
+        return header
 
     def format_line(self, line, msgid='-', token=''):
-        if not token:
-            token = self._token
+        prefix, suffix = self._header(msgid, token)
+        return prefix + self._now() + suffix + line
+
+    def format_lines(self, lines, msgid='-', token=''):
+        """Formats the lines with a timestamp shared by all of them."""
+        prefix, suffix = self._header(msgid, token)
+        header = prefix + self._now() + suffix
+        return [header + line for line in lines]
+
+    def format_block(self, lines, msgid='-', token=''):
+        """Returns the formatted lines joined into one string. The header is
+        put in front of each line by the join itself, no string is built for
+        individual lines."""
+        prefix, suffix = self._header(msgid, token)
+        header = prefix + self._now() + suffix
+        return header + header.join(lines)
 
-        if not self.send_datahub:
-            token_str_param = token
+
+class FormatJSON(object):
+    """Formats lines as compact JSON events, one per line. Each event has the
+    timestamp, hostname, appname and message fields. Fields are extracted
+    from key=value pairs and named groups of the pattern, the message is
+    always the original line. Lines which are JSON objects are used as
+    events. Dropped fields are removed from events."""
+
+    def __init__(self, hostname, appname, token, send_datahub=False, pattern=None, kv=False,
+                 passthrough=True, drop=()):
+        if hostname:
+            self._hostname = hostname
         else:
-            token_str_param = ''
-
-        return FormatSyslog.SYSLOG_MSG_FORMAT % (
-            token_str_param,
-            datetime.datetime.utcnow().isoformat('T'),
-            self._hostname, self._appname,
-            msgid,
-            self._hostname, self._appname,
-            line)
+            self._hostname = socket.gethostname()
+        self._appname = appname
+        if token and not send_datahub:
+            self._prefix = token + ' '
+        else:
+            self._prefix = ''
+        self._pattern = pattern
+        self._kv = kv
+        self._passthrough = passthrough
+        self._drop = drop
+        self._now = _Clock().now
+        self._encoder = json.JSONEncoder(separators=(',', ':'))
+
+    def _event(self, line, timestamp):
+        line = line.rstrip('\n').decode('utf-8', 'replace')
+        event = None
+        if self._passthrough and line[:1] == u'{':
+            try:
+                event = json.loads(line)
+            except ValueError:
+                pass
+            if not isinstance(event, dict):
+                event = None
+        if event is None:
+            event = {u'message': line}
+            if self._kv:
+                for key, value in KV_PATTERN.findall(line):
+                    if value[:1] == u'"':
+                        value = value[1:-1].replace(u'\\"', u'"')
+                    if key != u'message':
+                        event[key] = value
+            if self._pattern:
+                match = self._pattern.search(line)
+                if match:
+                    for key, value in match.groupdict().iteritems():
+                        if value is not None and key != u'message':
+                            event[key] = value
+        event.setdefault(u'timestamp', timestamp)
+        event.setdefault(u'hostname', self._hostname)
+        event.setdefault(u'appname', self._appname)
+        for key in self._drop:
+            event.pop(key, None)
+        return self._prefix + self._encoder.encode(event) + '\n'
+
+    def format_line(self, line, msgid='-', token=''):
+        return self._event(line, self._now() + 'Z')
+
+    def format_lines(self, lines):
+        timestamp = self._now() + 'Z'
+        return [self._event(line, timestamp) for line in lines]
+
+    def format_block(self, lines):
+        """Returns the formatted lines joined into one string."""
+        return ''.join(self.format_lines(lines))
+
+
+class JSONConfig(object):
+
+    """JSON format configuration of a log section. The pattern is compiled
+    once for the section and shared by formatters of all its files."""
+
+    DEFAULTS = {
+        JSON_KV: 'False',
+        JSON_PATTERN: '',
+        JSON_PASSTHROUGH: 'True',
+        JSON_DROP: '',
+    }
+
+    def __init__(self):
+        self.format = ''
+        self.values = dict(self.DEFAULTS)
+        self._pattern = None
+
+    def load(self, conf, section):
+        """Loads JSON format configuration of the section. Raises ValueError
+        if the configuration is not valid."""
+        try:
+            self.format = conf.get(section, FORMAT)
+        except ConfigParser.NoOptionError:
+            pass
+        if self.format not in ('', FORMAT_JSON):
+            raise ValueError("Unknown format `%s'" % self.format)
+        for item in self.DEFAULTS:
+            try:
+                self.values[item] = conf.get(section, JSON_PREFIX + item)
+            except ConfigParser.NoOptionError:
+                pass
+        if self.values[JSON_PATTERN]:
+            try:
+                self._pattern = re.compile(self.values[JSON_PATTERN], re.UNICODE)
+            except re.error, e:
+                raise ValueError("Invalid %s%s pattern: %s" % (JSON_PREFIX, JSON_PATTERN, e))
+
+    def save(self, conf, section):
+        """Saves values which differ from defaults."""
+        if self.format:
+            conf.set(section, FORMAT, self.format)
+        for item in self.DEFAULTS:
+            if self.values[item] != self.DEFAULTS[item]:
+                conf.set(section, JSON_PREFIX + item, self.values[item])
+
+    def enabled(self):
+        return self.format == FORMAT_JSON
+
+    def formatter(self, hostname, appname, token, send_datahub=False):
+        """Returns a new formatter for the log."""
+        drop = [x.strip() for x in self.values[JSON_DROP].split(',') if x.strip()]
+        return FormatJSON(hostname, appname, token, send_datahub, self._pattern,
+                          self.values[JSON_KV].lower() == 'true',
+                          self.values[JSON_PASSTHROUGH].lower() == 'true', drop)
@@ -0,0 +1,250 @@
+# coding: utf-8
+# vim: set ts=4 sw=4 et:
+
+"""
+Shared index of directory listings used to expand file name patterns.
+
+Followers look up their patterns on every open attempt and rename check.
+Instead of each of them listing directories and stat-ing every match, the
+index keeps directory listings until the directory changes (detected by
+inotify or by the directory's mtime) and caches modification times of
+matched files for a short while.
+"""
+
+import fnmatch
+import glob
+import logging
+import os
+import threading
+import time
+
+from file_watcher import DIR_EVENTS, IN_DELETE_SELF, IN_IGNORED, IN_MOVE_SELF, IN_Q_OVERFLOW
+
+__author__ = 'Logentries'
+
+__all__ = ['GlobIndex']
+
+LOG_LE_AGENT = 'logentries.com'
+log = logging.getLogger(LOG_LE_AGENT)
+
+# How long modification times of matched files are cached
+STAT_TTL = 1  # Seconds
+# How often expired entries and listings of removed directories are dropped
+PRUNE_INTERVAL = 60  # Seconds
+
+
+class _Directory(object):
+    """Cached listing of a directory. Guarded by the lock of the index."""
+
+    def __init__(self, path, lock):
+        self.path = path
+        self.names = None
+        self.matches = {}  # basename pattern -> matching paths
+        self.mtime = None
+        self.wd = None  # Set if the directory is watched by inotify
+        self.moved = False  # The watch may follow the directory to another path
+        self.valid = False
+        self._lock = lock
+
+    def notify(self, mask):
+        self._lock.acquire()
+        try:
+            if mask & IN_IGNORED:
+                self.wd = None
+            if mask & (IN_MOVE_SELF | IN_DELETE_SELF):
+                self.moved = True
+            self.valid = False
+        finally:
+            self._lock.release()
+
+
+class GlobIndex(object):
+    """Expands patterns the same way as glob.glob using cached directory
+    listings. Safe to be used from multiple threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirs = {}  # path -> _Directory
+        self._mtimes = {}  # path -> (mtime, checked)
+        self._newest = {}  # pattern -> (matches, newest, checked)
+        self._pruned = time.time()
+        self._notifier = None
+
+    def watch(self, notifier):
+        """Invalidates listings on inotify events instead of checking
+        directory mtimes on each lookup."""
+        self._notifier = notifier
+        notifier.subscribe(self)
+
+    def notify(self, mask):
+        """Called by the notifier on ticks and when events were lost."""
+        if mask & IN_Q_OVERFLOW:
+            self._lock.acquire()
+            try:
+                for d in self._dirs.itervalues():
+                    d.valid = False
+            finally:
+                self._lock.release()
+
+    def _unwatch(self, d):
+        """Removes the inotify watch of the directory if there is one. Called
+        with the lock held."""
+        if d.wd is not None:
+            self._notifier.remove(d.wd, d)
+            d.wd = None
+        d.moved = False
+
+    def _forget(self, path):
+        """Drops the directory from the index. Called with the lock held."""
+        d = self._dirs.pop(path, None)
+        if d:
+            self._unwatch(d)
+
+    def _list(self, path):
+        """Returns the directory listing, a _Directory with names empty if it
+        cannot be read. Called with the lock held."""
+        d = self._dirs.get(path)
+        if d and d.valid and d.wd is not None:
+            return d
+
+        try:
+            mtime = os.stat(path or os.curdir).st_mtime
+        except os.error:
+            # The directory is gone, it is indexed again once it reappears
+            self._forget(path)
+            d = _Directory(path, self._lock)
+            d.names = []
+            return d
+        if not d:
+            d = self._dirs[path] = _Directory(path, self._lock)
+        # Listings taken in the same second as the change may be incomplete
+        # on file systems with coarse timestamps
+        if d.valid and mtime == d.mtime and time.time() - mtime > 1:
+            return d
+
+        if d.moved:
+            self._unwatch(d)
+        if self._notifier and d.wd is None:
+            try:
+                d.wd = self._notifier.add(path or os.curdir, DIR_EVENTS | IN_MOVE_SELF | IN_DELETE_SELF, d)
+            except OSError, e:
+                log.debug("Cannot watch %s: %s", path, e.strerror)
+        d.valid = True
+        try:
+            d.names = os.listdir(path or os.curdir)
+        except os.error:
+            d.names = []
+        d.matches = {}
+        d.mtime = mtime
+        return d
+
+    def _match(self, dirname, basename):
+        """Returns paths in the directory matching the basename pattern."""
+        self._lock.acquire()
+        try:
+            d = self._list(dirname)
+            matches = d.matches.get(basename)
+            if matches is None:
+                names = d.names
+                if glob.has_magic(basename):
+                    if basename[0] != '.':
+                        names = [x for x in names if x[0] != '.']
+                    names = fnmatch.filter(names, basename)
+                elif basename in names:
+                    names = [basename]
+                else:
+                    names = []
+                matches = d.matches[basename] = [os.path.join(dirname, x) for x in names]
+            return matches
+        finally:
+            self._lock.release()
+
+    def glob(self, pattern):
+        """Returns a list of paths matching the pattern."""
+        if not glob.has_magic(pattern):
+            if os.path.lexists(pattern):
+                return [pattern]
+            return []
+
+        dirname, basename = os.path.split(pattern)
+        if glob.has_magic(dirname):
+            dirs = [x for x in self.glob(dirname) if os.path.isdir(x)]
+        else:
+            dirs = [dirname]
+
+        result = []
+        for dirname in dirs:
+            result.extend(self._match(dirname, basename))
+        return result
+
+    def _prune(self, now):
+        """Drops expired modification times and listings of directories
+        which no longer exist. Called with the lock held."""
+        for path, cached in self._mtimes.items():
+            if now - cached[1] >= STAT_TTL:
+                del self._mtimes[path]
+        for pattern, cached in self._newest.items():
+            if now - cached[2] >= STAT_TTL:
+                del self._newest[pattern]
+        for path in self._dirs.keys():
+            if not os.path.isdir(path or os.curdir):
+                self._forget(path)
+        self._pruned = now
+
+    def getmtime(self, path):
+        """Returns modification time of the file, the value may be up to
+        STAT_TTL seconds old. Raises os.error if the file does not exist."""
+        now = time.time()
+        self._lock.acquire()
+        try:
+            cached = self._mtimes.get(path)
+        finally:
+            self._lock.release()
+        if cached and now - cached[1] < STAT_TTL:
+            return cached[0]
+        try:
+            mtime = os.path.getmtime(path)
+        except os.error:
+            self._lock.acquire()
+            try:
+                self._mtimes.pop(path, None)
+            finally:
+                self._lock.release()
+            raise
+        self._lock.acquire()
+        try:
+            self._mtimes[path] = (mtime, now)
+        finally:
+            self._lock.release()
+        return mtime
+
+    def newest(self, pattern):
+        """Returns the most recently modified file matching the pattern or
+        None if there is none."""
+        matches = self.glob(pattern)
+        now = time.time()
+        self._lock.acquire()
+        try:
+            if now - self._pruned >= PRUNE_INTERVAL:
+                self._prune(now)
+            cached = self._newest.get(pattern)
+        finally:
+            self._lock.release()
+        if cached and now - cached[2] < STAT_TTL and cached[0] == matches:
+            return cached[1]
+
+        candidates = []
+        for name in matches:
+            try:
+                candidates.append((self.getmtime(name), name))
+            except os.error:
+                pass
+        newest = None
+        if candidates:
+            newest = max(candidates)[1]
+        self._lock.acquire()
+        try:
+            self._newest[pattern] = (matches, newest, now)
+        finally:
+            self._lock.release()
+        return newest
@@ -26,6 +26,8 @@ CONFIG_DIR_SYSTEM = '/etc/le'
 CONFIG_DIR_USER = '.le'
 LE_CONFIG = 'config'
 CACHE_NAME = 'cache'
+CHECKPOINTS_NAME = 'checkpoints'
+SPILL_NAME = 'spill'
 
 LOCAL_CONFIG_DIR_USER = '.le'
 LOCAL_CONFIG_DIR_SYSTEM = '/etc/le'
@@ -46,6 +48,20 @@ TOKEN_PARAM = 'token'
 PATH_PARAM = 'path'
 DESTINATION_PARAM = 'destination'
 PULL_SERVER_SIDE_CONFIG_PARAM = 'pull-server-side-config'
+INOTIFY_PARAM = 'inotify'
+TAIL_WORKERS_PARAM = 'tail-workers'
+CHECKPOINTS_PARAM = 'checkpoints'
+FOLLOW_ALL_PARAM = 'follow_all'
+START_PARAM = 'start'
+SPILL_MAX_SIZE_PARAM = 'spill-max-size'
+SEND_QUEUE_MEMORY_PARAM = 'send-queue-memory'
+QUEUE_OVERFLOW_PARAM = 'queue-overflow'
+KEY_CONNECTIONS_PARAM = 'key-connections'
+DATA_CONNECTIONS_PARAM = 'data-connections'
+EVENT_LOOP_PARAM = 'event-loop'
+WORKERS_PARAM = 'workers'
+COMPRESS_PARAM = 'compress'
+START_BEGINNING = 'beginning'
 KEY_LEN = 36
 ACCOUNT_KEYS_API = '/agent/account-keys/'
 ID_LOGS_API = '/agent/id-logs/'
@@ -57,8 +73,48 @@ AWS_S3_BUCKET_NAME = 'amazon_s3_bucket'
 AWS_S3_ACCOUNT_ID = 'amazon_s3_account_id'
 AWS_S3_SECRET_KEY = 'amazon_s3_secret_key'
 
-# Maximal queue size for events sent
-SEND_QUEUE_SIZE = 32000
+# Memory available to queues of events sent, shared by all transports
+SEND_QUEUE_MEMORY = 128  # MB
+
+# What happens with an event when the queue memory is used up
+OVERFLOW_BLOCK = 'block'  # Wait until there is space
+OVERFLOW_DROP_NEWEST = 'drop-newest'
+OVERFLOW_DROP_OLDEST = 'drop-oldest'
+OVERFLOW_SPILL = 'spill'  # Store on disk
+OVERFLOW_POLICIES = [OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, OVERFLOW_SPILL]
+
+# Default limit of events spilled to disk
+SPILL_MAX_SIZE = 1024  # MB
+
+# Number of connections shared by logs identified by log keys
+KEY_CONNECTIONS = 16
+
+# Time after which an idle connection of a log key is closed
+KEY_CONNECTION_IDLE = 60  # Seconds
+
+# Time a busy log key keeps its connection when other logs wait for one
+KEY_CONNECTION_HOLD = 10  # Seconds
+
+# Time after which a worker process without heartbeats is restarted
+WORKER_HEARTBEAT_TIMEOUT = 60  # Seconds
+
+# Time resolved addresses of endpoints are used before resolving them again
+DNS_CACHE_TTL = 60  # Seconds
+
+# Maximal size of entries coalesced into one write to the socket
+SEND_BATCH_SIZE = 256 * 1024  # Bytes
+
+# Maximal time spent collecting entries for one write
+SEND_BATCH_LATENCY = 0.05  # Seconds
+
+# Level of zlib compression of the data stream, lower levels save CPU
+COMPRESS_LEVEL = 6
+
+# Size of files of entries spilled to disk when the send queue is full
+SPILL_SEGMENT_SIZE = 8 * 1024 * 1024  # Bytes
+
+# Time between syncs of spilled entries to disk
+SPILL_SYNC_INTERVAL = 1  # Seconds
 
 # Logentries server details
 LE_SERVER_API = '/'
@@ -99,15 +155,37 @@ INV_SRV_RESP_TIMEOUT = 30  # Seconds
 # Time interval between re-trying to open log file
 REOPEN_TRY_INTERVAL = 1  # Seconds
 
+# Time between writes of followed files' offsets to disk
+CHECKPOINT_INTERVAL = 5  # Seconds
+
 # Number of lines which can be sent in one buck, piggybacking
 MAX_LINES_SENT = 10
 
 # Time in seconds spend between log re-checks
 TAIL_RECHECK = 0.2  # Seconds
 
+# Time between log re-checks when woken up by inotify, new data is
+# signalled immediately
+INOTIFY_RECHECK = 1  # Seconds
+
+# Maximal number of chunks a tail engine worker reads from one file before
+# servicing other files
+ENGINE_BATCH_READS = 4
+
+# Time between re-scans of file name patterns for new files
+GLOB_RESCAN_INTERVAL = 1  # Seconds
+
+# Files matched by a pattern which have not been written for this long are
+# not followed until they are modified again
+FOLLOW_IDLE_TIMEOUT = 3600  # Seconds
+
 # Number of attemps to read a file, until the name is recheck
 NAME_CHECK = 4  # TAIL_RECHECK cycles
 
+# A renamed file is followed until it has not grown for this long, writers
+# may still have it open
+RENAME_GRACE = 2  # Seconds
+
 # Number of read line false attemps between are-you-alive packets
 IAA_INTERVAL = 100
 IAA_TOKEN = "###LE-IAA###\n"
@@ -115,6 +193,9 @@ IAA_TOKEN = "###LE-IAA###\n"
 # Maximal size of a block of events
 MAX_EVENTS = 65536
 
+# Size of blocks read from followed files
+READ_CHUNK_SIZE = 262144
+
 # Interval between attampts to open a file
 REOPEN_INT = 1  # Seconds
 
@@ -193,6 +274,28 @@ Where parameters are:
                           the format is address:port with port being optional
   --system-stat-token=    set the token for system stats log (beta)
   --pull-server-side-config=False do not use server-side config for following files
+  --no-inotify            poll followed files instead of waiting for inotify events
+  --tail-workers=         follow files with given number of shared threads
+                          instead of a thread per file
+  --no-checkpoints        do not resume followed files from the last sent offset
+                          after restart
+  --from-start            send existing content of followed files including
+                          rotated files, unless resuming from a checkpoint
+  --send-queue-memory=    memory in MB for entries waiting to be sent (128)
+  --queue-overflow=       when the memory is used up block, drop-newest,
+                          drop-oldest (default) or spill
+  --spill-max-size=       store up to given MB of entries on disk when the send
+                          queue is full (1024), implies --queue-overflow=spill
+  --key-connections=      number of connections shared by logs identified by
+                          log keys (16)
+  --data-connections=     send logs identified by tokens over given number of
+                          parallel connections
+  --event-loop            follow files with the tail engine and run periodic
+                          tasks from one timer thread
+  --workers=              split followed logs between given number of
+                          processes
+  --compress              compress entries sent to the data endpoint or
+                          DataHub, the receiver must support it
 """
 
 
@@ -233,8 +336,10 @@ import sys
 import threading
 import time
 import datetime
+import functools
 import urllib
 import httplib
+import zlib
 import getpass
 import atexit
 import logging.handlers
@@ -242,6 +347,19 @@ from backports import CertificateError, match_hostname
 
 import formatters
 import metrics
+from file_watcher import FileNotifier, Wakeup, inotify_available, \
+    FILE_EVENTS, DIR_EVENTS, RENAME_EVENTS, IN_MODIFY, IN_CLOSE_WRITE
+from tail_engine import TailEngine
+from checkpoints import CheckpointStore
+from glob_index import GlobIndex
+from multiline import MultilineConfig
+from catch_up import read_siblings, Throughput
+from spill_queue import SpillQueue
+from memory_budget import MemoryBudget
+from connection_pool import ConnectionPool
+from resolver import AddressCache
+from scheduler import Scheduler
+from supervisor import Supervisor, Progress
 
 from s3_archiving_backend import AmazonS3ArchivingBackend
 
@@ -880,10 +998,12 @@ class Stats(object):
     """Collects statistics about the system work load.
     """
 
-    def __init__(self):
+    def __init__(self, scheduler=None):
         self.timer = None
+        self.sender = None
         self.to_remove = False
         self.first = True
+        self.scheduler = scheduler
 
         # Memory fields we are looking for in /proc/meminfo
         self.MEM_FIELDS = ['MemTotal:', 'Active:', 'Cached:']
@@ -1218,8 +1338,24 @@ class Stats(object):
         except socket.error:
             pass
 
+    def send_async(self, rq):
+        """
+        Sends the request on its own thread, so a slow API does not hold up the timer thread which may be shared
+        with other tasks. The request is dropped if the previous one is still being sent.
+        """
+        if self.sender and self.sender.is_alive():
+            log.debug('Previous statistics are still being sent, skipping')
+            return
+        self.sender = threading.Thread(target=self.new_request, args=(rq,), name='stats-sender')
+        self.sender.daemon = True
+        self.sender.start()
+
     def schedule(self, next_step):
-        if not self.to_remove:
+        if self.to_remove:
+            return
+        if self.scheduler:
+            self.timer = self.scheduler.call_later(next_step, self.send_stats)
+        else:
             self.timer = threading.Timer(next_step, self.send_stats, ())
             self.timer.daemon = True
             self.timer.start()
@@ -1241,7 +1377,7 @@ class Stats(object):
         if not self.first:
             # Send data
             if not config.datahub:
-                self.new_request(results)
+                self.send_async(results)
         else:
             self.first = False
 
@@ -1255,15 +1391,27 @@ class Stats(object):
             self.timer.cancel()
 
 
+def local_host_name():
+    """
+    Returns the host name put in front of events archived to S3.
+    """
+    if config.name is not None:
+        return os.path.basename(config.name)
+    return socket.getfqdn().split('.')[0]  # my-pc.domain.com -> my-pc
+
+
 class Follower(object):
     """
     The follower keeps an eye on the file specified and sends new events to the
     logentries infrastructure.  """
 
     def __init__(self, name, event_filter, transport, formatter, token='', log_tag=None, need_send_s3=False,
-                 s3_backend=None):
+                 s3_backend=None, engine=None, from_beginning=False, resume=None, multiline=None,
+                 catch_up=False, host_name=None):
         """ Initializes the follower. """
         self.name = name
+        # Names of existing files are followed as they are even if they look like patterns
+        self._literal = not glob.has_magic(name) or os.path.lexists(name)
         self.flush = True
         self.event_filter = event_filter
         self.formatter = formatter
@@ -1273,11 +1421,9 @@ class Follower(object):
         self.token = token
         self.amazon_s3_log_name = None
 
-        self.host_name = None
-        if config.name is not None:
-            self.host_name = os.path.basename(config.name)
-        else:
-            self.host_name = socket.getfqdn().split('.')[0]  # my-pc.domain.com -> my-pc
+        self.host_name = host_name
+        if self.host_name is None:
+            self.host_name = local_host_name()
 
         self.host_name_msg_part = ''
         if self.host_name is not None:
@@ -1296,47 +1442,88 @@ class Follower(object):
                 self.amazon_s3_log_name = tail
 
         self._file = None
+        self._file_id = None  # (st_dev, st_ino) of the opened file
+        self._partial = ''  # Incomplete last line of the file
+        self._renamed = None  # Time the renamed file last grew, until the new one is opened
+        self._offset = None  # Offset of the last line sent
+        self._sequence = 0  # Number of the last checkpoint passed to the transport
+        self._confirmed = 0  # Number of the last checkpoint confirmed by the transport
+        self._from_beginning = from_beginning
+        self._resume = resume  # (st_dev, st_ino, offset) to start at
+        self._drain = False
+        self._catch_up = catch_up
+        self._siblings = None  # Blocks of rotated siblings to send first
+        self._sibling_read = None  # (st_dev, st_ino, st_mtime, offset) of the last sibling read
+        self._held = None  # (block, ack) to be queued before reading on
+        self._catching_up = False  # Until the end of file is reached
+        self._throughput = None
+        self._assembler = None
+        if multiline and multiline.enabled():
+            self._assembler = multiline.assembler()
         self._shutdown = False
-        self._worker = threading.Thread(
-            target=self.monitorlogs, name=self.name)
-        self._worker.daemon = True
-        self._worker.start()
+        self._idle_cnt = 0
+        self._next_open = 0
+        self.last_read = time.time()
+
+        # Wait for inotify events instead of polling if available
+        self._engine = engine
+        self._wakeup = None
+        self._watches = []
+        if file_notifier:
+            if engine:
+                self._wakeup = engine.listener(self)
+            else:
+                self._wakeup = Wakeup()
+            file_notifier.subscribe(self._wakeup)
+
+        if engine:
+            # Serviced by the shared tail engine threads
+            self._worker = None
+            self.real_name = None
+            engine.add(self)
+        else:
+            self._worker = threading.Thread(
+                target=self.monitorlogs, name=self.name)
+            self._worker.daemon = True
+            self._worker.start()
 
     def _file_candidate(self):
         """
-        Returns list of file names which corresponds to the specified template.
+        Returns the most recently modified file which corresponds to the specified template.
         """
-        try:
-            candidates = glob.glob(self.name)
+        if self._literal:
+            if os.path.exists(self.name):
+                return self.name
+            return None
+        return glob_index.newest(self.name)
 
-            if len(candidates) == 0:
-                return None
+    def _open_log_once(self):
+        """Tries to open the log file. Returns True if the file has been opened."""
+        self.real_name = None
+        candidate = self._file_candidate()
 
-            candidate_times = [[os.path.getmtime(name), name]
-                               for name in candidates]
-            candidate_times.sort()
-            candidate_times.reverse()
-            return candidate_times[0][1]
-        except os.error:
-            return None
+        if candidate:
+            self.real_name = candidate
+            try:
+                self._close_log()
+                self._file = open(self.real_name)
+                st = os.fstat(self._file.fileno())
+                self._file_id = (st.st_dev, st.st_ino)
+                self._partial = ''
+                self._watch_log()
+                return True
+            except IOError:
+                pass
+        return False
 
     def _open_log(self):
         """Keeps trying to re-open the log file. Returns when the file has been
         opened or when requested to remove.  """
         error_info = True
-        self.real_name = None
 
         while not self._shutdown:
-            candidate = self._file_candidate()
-
-            if candidate:
-                self.real_name = candidate
-                try:
-                    self._close_log()
-                    self._file = open(self.real_name)
-                    break
-                except IOError:
-                    pass
+            if self._open_log_once():
+                break
 
             if error_info:
                 log.info("Cannot open file '%s', re-trying in %ss intervals",
@@ -1345,139 +1532,612 @@ class Follower(object):
             time.sleep(REOPEN_TRY_INTERVAL)
 
     def _close_log(self):
+        self._renamed = None
         if self._file:
+            self._unwatch_log()
             try:
                 self._file.close()
             except IOError:
                 pass
             self._file = None
 
-    def _log_rename(self):
-        """Detects file rename."""
+    def _watch_log(self):
+        """Registers the opened file and its directory for inotify events."""
+        if not self._wakeup:
+            return
+        for path, mask in [(self.real_name, FILE_EVENTS),
+                           (os.path.dirname(self.real_name), DIR_EVENTS)]:
+            try:
+                self._watches.append(file_notifier.add(path, mask, self._wakeup))
+            except OSError, e:
+                log.debug("Cannot watch %s: %s", path, e.strerror)
+
+    def _unwatch_log(self):
+        for wd in self._watches:
+            file_notifier.remove(wd, self._wakeup)
+        self._watches = []
+
+    def _wait_for_data(self):
+        """Waits until new data may be available. Returns mask of inotify
+        events received or 0 if woken up by timer."""
+        if self._wakeup:
+            return self._wakeup.wait()
+        time.sleep(TAIL_RECHECK)
+        return 0
 
-        # Get file candidates
-        candidate = self._file_candidate()
+    def _log_rename(self):
+        """Detects file rename. Returns True if the name followed points to
+        a different file (device and inode) than the one opened."""
+        if self._literal:
+            candidate = self.name
+        else:
+            candidate = glob_index.newest(self.name)
         if not candidate:
             return False
 
         try:
-            ctime1 = os.fstat(self._file.fileno()).st_mtime
-            ctime_new = os.path.getmtime(candidate)
-            ctime2 = os.fstat(self._file.fileno()).st_mtime
+            st = os.stat(candidate)
         except os.error:
-            pass
-
-        if ctime1 == ctime2 and ctime1 != ctime_new:
-            # We have a name change according to the time
-            return True
-
-        return False
+            # Renamed but not re-created yet, keep reading the old file
+            return False
+        return (st.st_dev, st.st_ino) != self._file_id
 
-    def _read_log_line(self):
-        """ Reads a line from the log. Checks maximal line size. """
-        buff = self._file.readline(MAX_EVENTS)
-        return buff
+    def _drain_log(self):
+        """Sends the rest of the file before switching to the new one."""
+        while True:
+            position = self._get_file_position()
+            lines = self._read_log_lines()
+            if lines:
+                self._send_lines(lines, checkpoint=True)
+            elif self._get_file_position() == position:
+                # End of file
+                break
+        if self._partial:
+            # The file will not grow any more, send the incomplete line
+            self._send_lines([self._partial + '\n'])
+            self._partial = ''
+        if self._assembler:
+            self._send_events(self._assembler.flush(True))
+
+    def _read_log_lines(self):
+        """Reads a block from the log and returns list of complete lines in
+        it. The incomplete last line is kept for the next read. Lines longer
+        than MAX_EVENTS are split."""
+        buff = os.read(self._file.fileno(), READ_CHUNK_SIZE)
+        if not buff:
+            if self._catching_up:
+                self._catching_up = False
+                self._throughput.done()
+            return []
+        if self._renamed is not None:
+            self._renamed = time.time()
+        if self._catching_up:
+            self._throughput.add(len(buff))
+        return self._split_lines(buff)
+
+    def _split_lines(self, buff):
+        """Splits the block read into lines."""
+        lines = (self._partial + buff).split('\n')
+        self._partial = lines.pop()
+        lines = [line + '\n' for line in lines]
+
+        if len(self._partial) >= MAX_EVENTS or (lines and max(map(len, lines)) > MAX_EVENTS):
+            split = []
+            for line in lines:
+                while len(line) > MAX_EVENTS:
+                    split.append(line[:MAX_EVENTS])
+                    line = line[MAX_EVENTS:]
+                split.append(line)
+            while len(self._partial) >= MAX_EVENTS:
+                split.append(self._partial[:MAX_EVENTS])
+                self._partial = self._partial[MAX_EVENTS:]
+            lines = split
+        return lines
 
     def _set_file_position(self, offset, start=FILE_BEGIN):
         """ Move the position of filepointers."""
-        self._file.seek(offset, start)
+        os.lseek(self._file.fileno(), offset, start)
+        self._partial = ''
 
     def _get_file_position(self):
         """ Returns the position filepointers."""
-        pos = self._file.tell()
+        pos = os.lseek(self._file.fileno(), 0, FILE_CURRENT)
         return pos
 
-    def _get_line(self):
+    def _set_start_position(self):
+        """Moves to the offset recorded by the previous run if the file is
+        the same, otherwise at the beginning or the end of the log file."""
+        offset = None
+        file_size = os.fstat(self._file.fileno()).st_size
+        if self._resume and self._resume[:2] == self._file_id:
+            offset = self._resume[2]
+        elif checkpoint_store:
+            offset = checkpoint_store.get(self._file_id[0], self._file_id[1], self.real_name)
+            if offset > file_size:
+                # The inode has been reused by a new file
+                offset = None
+            previous = None
+            if offset is None:
+                previous = checkpoint_store.find(self.real_name)
+            if previous:
+                # Rotated while the agent was not running, send what has been
+                # written to rotated files since the checkpoint
+                log.info("%s has been rotated since the last run", self.real_name)
+                self._set_file_position(0)
+                self._start_catch_up(previous)
+                return
+        if offset is not None and offset <= file_size:
+            log.info("Resuming %s at offset %d", self.real_name, offset)
+            self._set_file_position(offset)
+        elif self._catch_up:
+            self._set_file_position(0)
+            self._start_catch_up()
+        elif self._from_beginning:
+            self._set_file_position(0)
+        else:
+            self._set_file_position(0, FILE_END)
+
+    def _start_catch_up(self, checkpoint=None):
+        """Sends rotated siblings and then the file from the beginning as
+        fast as the transport accepts them. With the checkpoint of the file
+        rotated since, only siblings written after it are sent."""
+        log.info("Catching up %s", self.real_name)
+        self._catching_up = True
+        self._throughput = Throughput(self.real_name)
+        self._sibling_read = None
+        self._siblings = read_siblings(self.real_name, READ_CHUNK_SIZE, checkpoint, self._sibling_done)
+
+    def _sibling_done(self, dev, ino, mtime, offset):
+        """Called when a rotated sibling has been read completely."""
+        self._sibling_read = (dev, ino, mtime, offset)
+
+    def _read_catch_up(self):
+        """Returns list of lines read from rotated siblings or None when all
+        siblings have been sent."""
+        try:
+            buff = self._siblings.next()
+        except StopIteration:
+            self._siblings = None
+            self._sibling_read = None
+            return None
+        if not buff:
+            # End of the sibling, its last line may be incomplete
+            lines = []
+            if self._partial:
+                lines = [self._partial + '\n']
+                self._partial = ''
+            return lines
+        self._throughput.add(len(buff))
+        return self._split_lines(buff)
+
+    def _save_position(self):
+        """Records the offset of the last line passed to the transport.
+        Returns the checkpoint (st_dev, st_ino, path, offset) to be stored
+        once the transport has sent the lines, or None. While siblings are
+        sent, it is the end of the last sibling read completely, dated by
+        its modification time so that siblings rotated after it are sent
+        again after a restart."""
+        if self._siblings:
+            if not self._sibling_read:
+                return None
+            dev, ino, mtime, offset = self._sibling_read
+            if self._assembler:
+                offset -= self._assembler.pending()
+            return (dev, ino, self.real_name, offset, mtime)
+        self._offset = self._get_file_position() - len(self._partial)
+        if self._assembler:
+            self._offset -= self._assembler.pending()
+        return self._file_id + (self.real_name, self._offset)
+
+    def _checkpoint_sent(self, sequence, checkpoint):
+        """Stores the checkpoint, called by the transport once lines up to
+        it have been sent or spilled to disk. Lines saved by the transport
+        on close may be confirmed out of order, so older confirmations are
+        ignored."""
+        if sequence < self._confirmed:
+            return
+        self._confirmed = sequence
+        checkpoint_store.update(*checkpoint)
+
+    def position(self):
+        """Returns (st_dev, st_ino, offset) of the last line sent or None."""
+        if self._offset is None or not self._file_id:
+            return None
+        return self._file_id + (self._offset,)
+
+    def _check_truncation(self):
+        """Recovers from external file modification."""
+        position = self._get_file_position()
+        file_size = os.fstat(self._file.fileno()).st_size
+        if file_size < position:
+            # File has been truncated (copytruncate), follow it from the
+            # beginning to pick up lines written since
+            log.debug("File %s truncated, reading from the beginning", self.real_name)
+            self._set_file_position(0)
+
+    def _idle(self, events):
+        """Checks the file for rename and truncation when there is no new
+        line. Returns True if the file has been re-opened."""
+        # Send the last multi-line event once it is complete
+        if self._assembler:
+            self._send_events(self._assembler.flush())
+
+        if self._renamed is not None:
+            # Renamed, writers which still have the file open are followed
+            # until they close it or stop writing
+            if events & IN_CLOSE_WRITE or time.time() - self._renamed >= RENAME_GRACE:
+                self._switch_log()
+                return True
+            return False
+
+        # Log rename check, immediate if the directory has changed
+        self._idle_cnt += 1
+        if self._idle_cnt == NAME_CHECK or events & RENAME_EVENTS:
+            self._idle_cnt = 0
+            if self._log_rename():
+                log.debug("%s has been renamed, following it until it is closed", self.real_name)
+                self._renamed = time.time()
+                return False
+            self._check_truncation()
+        elif events & IN_MODIFY:
+            # Modified but nothing to read, the file may be truncated
+            self._check_truncation()
+        return False
+
+    def _switch_log(self):
+        """Sends the rest of the renamed file and opens the new one."""
+        self._drain_log()
+        if self._engine:
+            if not self._open_log_once():
+                self._next_open = time.time() + REOPEN_TRY_INTERVAL
+        else:
+            self._open_log()
+
+    def _get_lines(self):
         """
-        Returns a block of newly detected line from the log. Returns None in case of timeout.
+        Returns a list of newly detected lines from the log. Returns an empty list in case of timeout.
         """
-        # Moves at the end of the log file
+        # Moves at the end of the log file or where the previous run stopped
         if self.flush:
-            self._set_file_position(0, FILE_END)
+            self._set_start_position()
             self.flush = False
 
-        # TODO: investigate select-like approach?
-        idle_cnt = 0
+        if self._siblings:
+            lines = self._read_catch_up()
+            if lines is not None:
+                return lines
+
+        self._idle_cnt = 0
         iaa_cnt = 0
-        line = None
+        lines = []
         while iaa_cnt != IAA_INTERVAL and not self._shutdown:
-            # Collect line
-            line = self._read_log_line()
-            if len(line) != 0:
+            # Collect lines
+            lines = self._read_log_lines()
+            if lines:
                 break
 
             # No line, wait
-            time.sleep(TAIL_RECHECK)
-
-            # Log rename check
-            idle_cnt += 1
-            if idle_cnt == NAME_CHECK:
-                if self._log_rename():
-                    self._open_log()
-                    iaa_cnt = 0
-                else:
-                    # Recover from external file modification
-                    position = self._get_file_position()
-                    self._set_file_position(0, FILE_END)
-                    file_size = self._get_file_position()
-                    if file_size < position:
-                        # File has been externaly modified
-                        position = file_size
-                    self._set_file_position(position)
-                idle_cnt = 0
-            else:
-                # To reset end-of-line error
-                self._set_file_position(self._get_file_position())
+            events = self._wait_for_data()
+            if self._idle(events):
+                iaa_cnt = 0
             iaa_cnt += 1
 
-        return line
-
-    def _send_line(self, line):
-        """ Sends the line. """
-        if line:
-            line = self.event_filter(line)
-        if not line:
+        return lines
+
+    def _send_lines(self, lines, checkpoint=False):
+        """ Sends the lines, multi-line events are assembled first. With
+        checkpoint, the position after the lines is checkpointed once the
+        transport has sent them. """
+        if self._assembler:
+            lines = self._assembler.feed(lines)
+        position = None
+        if checkpoint:
+            position = self._save_position()
+        self._send_events(lines, position)
+
+    def _send_events(self, lines, checkpoint=None):
+        """ Sends the events. Formatted events are joined into a single
+        block, no string is built for individual events. """
+        if self.event_filter is not filter_events:
+            lines = filter(None, map(self.event_filter, lines))
+        if not lines:
+            # The checkpoint moves with the next lines sent
             return
         if config.debug_events:
-            print >> sys.stderr, line,
-        self.transport.send(self.formatter.format_line(line))
+            print >> sys.stderr, ''.join(lines),
+        ack = None
+        if checkpoint and checkpoint_store:
+            self._sequence += 1
+            ack = functools.partial(self._checkpoint_sent, self._sequence, checkpoint)
+        block = self.formatter.format_block(lines)
+        if self._catching_up and self._engine:
+            # The engine worker is shared by other followers, so it must not
+            # wait for the queue; the block is offered again on next service
+            if not self.transport.offer_block(block, ack):
+                self._held = (block, ack)
+        else:
+            self.transport.send_block(block, self._catching_up, ack)
 
         if self.need_send_s3 is True and self.s3_backend is not None:
-            amazon_msg = self.token + ' ' + self.host_name_msg_part + line
-            self.s3_backend.put_data_to_local_log(self.amazon_s3_log_name, self.token, amazon_msg)
+            prefix = self.token + ' ' + self.host_name_msg_part
+            self.s3_backend.put_lines_to_local_log(self.amazon_s3_log_name, self.token, prefix, lines)
 
-    def close(self):
+    def close(self, drain=False):
         """Closes the follower by setting the shutdown flag and waiting for the
-        worker thread to stop."""
+        worker thread to stop. With drain, the rest of the file is sent
+        before closing it (tail engine only)."""
+        self._drain = drain
         self._shutdown = True
-        self._worker.join(1.0)
+        if self._wakeup:
+            self._wakeup.notify(0)
+            file_notifier.unsubscribe(self._wakeup)
+        if self._engine:
+            self._engine.remove(self)
+        else:
+            self._worker.join(1.0)
+
+    def service(self, events):
+        """Reads and sends lines available without blocking, called by the
+        tail engine. Returns True if there may be more lines to read."""
+        if self._shutdown:
+            return False
+        if not self._file:
+            if time.time() < self._next_open:
+                return False
+            if not self._open_log_once():
+                if self._next_open == 0:
+                    log.info("Cannot open file '%s', re-trying in %ss intervals",
+                             self.name, REOPEN_INT)
+                self._next_open = time.time() + REOPEN_TRY_INTERVAL
+                return False
+            self._next_open = 0
+
+        try:
+            # Moves at the end of the log file or where the previous run stopped
+            if self.flush:
+                self._set_start_position()
+                self.flush = False
+
+            if self._held:
+                if not self.transport.offer_block(*self._held):
+                    # Retried on the next tick or event
+                    return False
+                self._held = None
+
+            if self._siblings:
+                for _ in xrange(ENGINE_BATCH_READS):
+                    lines = self._read_catch_up()
+                    if lines is None:
+                        break
+                    self._send_lines(lines, checkpoint=True)
+                    if self._held:
+                        return False
+                else:
+                    return True
+
+            for _ in xrange(ENGINE_BATCH_READS):
+                lines = self._read_log_lines()
+                if not lines:
+                    break
+                self._idle_cnt = 0
+                self.last_read = time.time()
+                self._send_lines(lines, checkpoint=True)
+                if self._held:
+                    return False
+            else:
+                # Batch is full, let other followers run
+                return True
+
+            self._idle(events)
+        except (IOError, OSError), e:
+            if config.debug:
+                log.debug("IOError: %s", e)
+            self._close_log()
+        return False
+
+    def release(self):
+        """Closes the file, called by the tail engine."""
+        # Lines left are queued without waiting for room, as when tailing
+        self._catching_up = False
+        if self._held:
+            self.transport.send(*self._held)
+            self._held = None
+        if self._drain and self._file:
+            try:
+                self._drain_log()
+            except (IOError, OSError), e:
+                log.debug("Cannot read %s: %s", self.real_name, e)
+        self._close_log()
 
     def monitorlogs(self):
         """ Opens the log file and starts to collect new events. """
         self._open_log()
         while not self._shutdown:
+            lines = []
             try:
-                line = self._get_line()
-            except IOError, e:
+                lines = self._get_lines()
+            except (IOError, OSError), e:
                 if config.debug:
                     log.debug("IOError: %s", e)
                 self._open_log()
-            if line:
-                self._send_line(line)
+            if lines:
+                self.last_read = time.time()
+                self._send_lines(lines, checkpoint=True)
         self._close_log()
 
 
+class MultiFollower(object):
+    """
+    Follows every file which matches the name pattern. Files are followed by
+    followers driven by the tail engine, new files are picked up as they
+    appear and files which disappear or stay idle are retired.  """
+
+    def __init__(self, name, event_filter, transport, formatter, token='', need_send_s3=False,
+                 s3_backend=None, engine=None, multiline=None, from_beginning=False, host_name=None):
+        self.name = name
+        self.event_filter = event_filter
+        self.transport = transport
+        self.formatter = formatter
+        self.token = token
+        self.need_send_s3 = need_send_s3
+        self.s3_backend = s3_backend
+        self.multiline = multiline
+        self.from_beginning = from_beginning
+        self.host_name = host_name
+        if self.host_name is None:
+            self.host_name = local_host_name()
+
+        self._engine = engine
+        self._lock = threading.Lock()
+        self._followers = {}  # path -> Follower
+        self._retired = {}  # path -> (st_dev, st_ino, offset, time of retirement)
+        self._first_scan = True
+        self._next_scan = 0
+        self._shutdown = False
+
+        self._wakeup = None
+        self._watches = []
+        if file_notifier:
+            self._wakeup = engine.listener(self)
+            file_notifier.subscribe(self._wakeup)
+            # Get notified about new files immediately if possible
+            dirname = os.path.dirname(name)
+            if not glob.has_magic(dirname):
+                try:
+                    self._watches.append(file_notifier.add(dirname, DIR_EVENTS, self._wakeup))
+                except OSError, e:
+                    log.debug("Cannot watch %s: %s", dirname, e.strerror)
+        engine.add(self)
+
+    def _start_follower(self, path, from_beginning, resume):
+        log.info("Following %s", path)
+        self._followers[path] = Follower(path, self.event_filter, self.transport, self.formatter, self.token,
+                                         None, self.need_send_s3, self.s3_backend, self._engine,
+                                         from_beginning, resume, self.multiline, host_name=self.host_name)
+
+    def _scan(self):
+        """Starts followers for new files and retires gone and idle ones."""
+        now = time.time()
+        paths = set(glob_index.glob(self.name))
+
+        for path, follower in self._followers.items():
+            if path not in paths:
+                log.info("Stopped following %s", path)
+                follower.close(drain=True)
+                del self._followers[path]
+            elif now - follower.last_read > FOLLOW_IDLE_TIMEOUT:
+                log.debug("Retiring idle file %s", path)
+                position = follower.position()
+                if position:
+                    self._retired[path] = position + (now,)
+                follower.close()
+                del self._followers[path]
+
+        for path in self._retired.keys():
+            if path not in paths:
+                del self._retired[path]
+
+        for path in paths:
+            if path in self._followers:
+                continue
+            retired = self._retired.get(path)
+            if retired:
+                try:
+                    if glob_index.getmtime(path) < retired[3]:
+                        continue
+                except os.error:
+                    continue
+                del self._retired[path]
+                self._start_follower(path, True, retired[:3])
+            elif path not in self._retired:
+                # Files created after the start are followed from the beginning
+                self._start_follower(path, self.from_beginning or not self._first_scan, None)
+        self._first_scan = False
+
+    def service(self, events):
+        """Rescans the pattern, called by the tail engine."""
+        self._lock.acquire()
+        try:
+            if self._shutdown:
+                return False
+            now = time.time()
+            if now >= self._next_scan or events & RENAME_EVENTS:
+                self._next_scan = now + GLOB_RESCAN_INTERVAL
+                self._scan()
+        finally:
+            self._lock.release()
+        return False
+
+    def release(self):
+        pass
+
+    def close(self):
+        self._lock.acquire()
+        try:
+            self._shutdown = True
+            followers = self._followers.values()
+            self._followers = {}
+        finally:
+            self._lock.release()
+        if self._wakeup:
+            for wd in self._watches:
+                file_notifier.remove(wd, self._wakeup)
+            file_notifier.unsubscribe(self._wakeup)
+        self._engine.remove(self)
+        for follower in followers:
+            follower.close()
+
+
+# SSL contexts of transports by certificate file
+_ssl_contexts = {}
+_ssl_contexts_lock = threading.Lock()
+
+
+def transport_ssl_context(certs):
+    """Returns the SSL context for connections verified with the certificates
+    given. The context is shared by all transports so that certificates are
+    loaded once rather than on each reconnect. TLS 1.2 or newer is
+    negotiated."""
+    _ssl_contexts_lock.acquire()
+    try:
+        context = _ssl_contexts.get(certs)
+        if not context:
+            context = ssl.create_default_context(cafile=certs)
+            context.options |= getattr(ssl, 'OP_NO_TLSv1', 0) | getattr(ssl, 'OP_NO_TLSv1_1', 0)
+            # The host name is checked with match_hostname as on older Pythons
+            context.check_hostname = False
+            _ssl_contexts[certs] = context
+        return context
+    finally:
+        _ssl_contexts_lock.release()
+
+
 class Transport(object):
     """Encapsulates simple connection to a remote host. The connection may be
     encrypted. Each communication is started with the preamble."""
 
-    def __init__(self, endpoint, port, use_ssl, preamble, debug_transport_events):
+    def __init__(self, endpoint, port, use_ssl, preamble, debug_transport_events, pool=None, shard=0,
+                 compress=False, shards=None):
         # Copy transport configuration
         self.endpoint = endpoint
         self.port = port
         self.use_ssl = use_ssl
         self.preamble = preamble
-        self._entries = Queue.Queue(SEND_QUEUE_SIZE)
+        self.shard = shard
+        self.compress = compress
+        self._compressor = None
+        self._entries = Queue.Queue()
+        self._budget = send_budget or MemoryBudget(SEND_QUEUE_MEMORY * 1024 * 1024)
+        self._overflow = config.get_queue_overflow()
+        self._dropped = 0
+        self._spill = self._open_spill()
+        if shards is not None:
+            self._adopt_spills(shards)
+        self._unsent = None  # (batch, acks) being sent, taken by close
+        self._unsent_lock = threading.Lock()
+        self._spilled_acks = []  # Acks of spilled entries, called once older entries are sent
+        self._spilled_acks_lock = threading.Lock()
+        self._address_index = None
         self._socket = None
         self._debug_transport_events = debug_transport_events
 
@@ -1497,17 +2157,102 @@ class Transport(object):
             # XXX Do we need to die here?
         self._certs = cert_name
 
-        # Start asynchronous worker
-        self._worker = threading.Thread(target=self.run)
-        self._worker.daemon = True
-        self._worker.start()
+        # Start asynchronous worker unless the connection pool sends entries
+        self._pool = pool
+        self._worker = None
+        if not pool:
+            self._worker = threading.Thread(target=self.run)
+            self._worker.daemon = True
+            self._worker.start()
+
+    def _open_spill(self):
+        """Returns the disk queue for entries which do not fit into the send
+        queue or None if spilling is not configured. Each destination has its
+        own directory so that spilled entries are sent to it after restart.
+        Shards of the default transport are separate destinations."""
+        if self._overflow != OVERFLOW_SPILL:
+            return None
+        directory = self._spill_directory(self.shard)
+        try:
+            return self._spill_queue(directory)
+        except (IOError, OSError), e:
+            log.warning("Cannot spill entries to %s, dropping them when the queue is full: %s",
+                        directory, e.strerror)
+            self._overflow = OVERFLOW_DROP_OLDEST
+            return None
+
+    def _spill_directory(self, shard):
+        """Returns the spill directory of the shard of this destination."""
+        destination = hashlib.md5('%s:%s:%s' % (self.endpoint, self.port, self.preamble)).hexdigest()
+        if shard:
+            destination += '-%d' % shard
+        if config.get_worker_count() > 1:
+            destination += '-w%d' % config.worker_index
+        return os.path.join(config.config_dir_name + SPILL_NAME, destination)
+
+    @staticmethod
+    def _spill_queue(directory):
+        max_size = config.spill_max_size
+        if max_size == NOT_SET:
+            max_size = SPILL_MAX_SIZE
+        return SpillQueue(directory, max_size * 1024 * 1024, SPILL_SEGMENT_SIZE, SPILL_SYNC_INTERVAL, scheduler)
+
+    def _orphaned_spills(self, shards):
+        """Returns spill directories of shards numbered from shards on, left
+        over from a run with more data connections."""
+        base = self._spill_directory(0)
+        parent, name = os.path.split(base)
+        destination, worker = re.match(r'([0-9a-f]+)(.*)$', name).groups()
+        pattern = re.compile(r'%s-(\d+)%s$' % (destination, re.escape(worker)))
+        try:
+            names = os.listdir(parent)
+        except OSError:
+            return []
+        orphans = []
+        for name in names:
+            match = pattern.match(name)
+            if match and int(match.group(1)) >= shards:
+                orphans.append((int(match.group(1)), os.path.join(parent, name)))
+        return [directory for shard, directory in sorted(orphans)]
+
+    def _adopt_spills(self, shards):
+        """Moves entries spilled by shards which no longer exist to the spill
+        of this transport, so that they are sent after the entries spilled
+        by this shard before the restart."""
+        for directory in self._orphaned_spills(shards):
+            if not self._spill:
+                log.warning("Entries spilled to %s by a removed shard are not sent, spilling is disabled",
+                            directory)
+                continue
+            count = 0
+            try:
+                orphan = self._spill_queue(directory)
+                try:
+                    entry = orphan.get()
+                    while entry is not None:
+                        self._spill.put(entry)
+                        count += 1
+                        entry = orphan.get()
+                    # Moved entries are on disk before the old ones are removed
+                    self._spill.sync()
+                finally:
+                    orphan.close()
+                os.rmdir(directory)
+            except (IOError, OSError), e:
+                log.warning("Cannot move entries spilled to %s by a removed shard: %s", directory, e.strerror)
+            if count:
+                log.info("Moved %d entries spilled to %s by a removed shard", count, directory)
 
     def _get_address(self):
         """Returns an IP address of the endpoint. If the endpoint resolves to
-        multiple addresses, a random one is selected. This works better than
-        default selection."""
-        return random.choice(
-            socket.getaddrinfo(self.endpoint, self.port))[4][0]
+        multiple addresses, a random one is selected first. This works better
+        than default selection. After a failed attempt, the next address is
+        used. Addresses are cached so that a slow resolver does not delay
+        reconnects."""
+        addresses = address_cache.lookup(self.endpoint, self.port)
+        if self._address_index is None:
+            self._address_index = random.randrange(len(addresses))
+        return addresses[self._address_index % len(addresses)]
 
     def _connect_ssl(self, plain_socket):
         """Connects the socket and wraps in SSL. Returns the wrapped socket
@@ -1519,15 +2264,19 @@ class Transport(object):
             s = plain_socket
             s.connect((address, self.port))
 
-            try:
-                s = ssl.wrap_socket(
-                    plain_socket, ca_certs=self._certs,
-                    cert_reqs=ssl.CERT_REQUIRED, ssl_version=ssl.PROTOCOL_TLSv1,
-                    ciphers="HIGH:-aNULL:-eNULL:-PSK:RC4-SHA:RC4-MD5")
-            except TypeError:
-                s = ssl.wrap_socket(
-                    plain_socket, ca_certs=self._certs, cert_reqs=ssl.CERT_REQUIRED,
-                    ssl_version=ssl.PROTOCOL_TLSv1)
+            if FEAT_SSL_CONTEXT:
+                s = transport_ssl_context(self._certs).wrap_socket(plain_socket, server_hostname=self.endpoint)
+            else:
+                # Pythons older than 2.7.9 have no SSL contexts
+                try:
+                    s = ssl.wrap_socket(
+                        plain_socket, ca_certs=self._certs,
+                        cert_reqs=ssl.CERT_REQUIRED, ssl_version=ssl.PROTOCOL_TLSv1,
+                        ciphers="HIGH:-aNULL:-eNULL:-PSK:RC4-SHA:RC4-MD5")
+                except TypeError:
+                    s = ssl.wrap_socket(
+                        plain_socket, ca_certs=self._certs, cert_reqs=ssl.CERT_REQUIRED,
+                        ssl_version=ssl.PROTOCOL_TLSv1)
 
             try:
                 match_hostname(s.getpeercert(), self.endpoint)
@@ -1580,13 +2329,18 @@ class Transport(object):
                 # If the socket is open, send preamble and leave
                 if self._socket:
                     if self.preamble:
-                        self._socket.send(self.preamble)
+                        self._socket.sendall(self.preamble)
+                    if self.compress:
+                        # Each connection carries a stream of its own
+                        self._compressor = zlib.compressobj(COMPRESS_LEVEL)
                     break
             except socket.error:
                 if self._shutdown:
                     return  # XXX
 
-            # Wait between attempts
+            # Wait between attempts, try another address next time
+            if self._address_index is not None:
+                self._address_index += 1
             time.sleep(delay)
             retry += 1
             delay *= 2
@@ -1607,33 +2361,217 @@ class Transport(object):
         # Keep sending data until successful
         while not self._shutdown:
             try:
-                self._socket.send(entry)
+                if self._compressor:
+                    # Flushed so that the receiver can decompress the batch
+                    # without waiting for the next one
+                    self._socket.sendall(self._compressor.compress(entry) +
+                                         self._compressor.flush(zlib.Z_SYNC_FLUSH))
+                else:
+                    self._socket.sendall(entry)
                 if self._debug_transport_events:
                     print >> sys.stderr, entry,
-                break
+                return True
             except socket.error:
                 self._open_connection()
+        return False
 
-    def send(self, entry):
+    def send(self, entry, ack=None):
         """Sends the entry given. Depending on transport configuration it will
         block until the entry is sent or it will queue the entry for async
-        send.
+        send. The ack is called once the entry has been written to the
+        connection or spilled to disk and entries queued before it have been
+        written as well, it is not called if the entry is dropped.
 
         Note: entry must end with a new line
         """
-        while True:
-            try:
-                self._entries.put_nowait(entry)
-                break
-            except Queue.Full:
+        self._queue(entry, ack)
+        if self._pool:
+            self._pool.notify(self)
+
+    def _queue(self, entry, ack=None):
+        if self._spill:
+            # Once entries are spilled, new ones follow them to keep the order
+            if self._spill.empty() and self._budget.acquire(len(entry)):
+                self._entries.put((entry, ack))
+            else:
+                self._spill.put(entry)
+                self._defer(ack)
+        elif self._overflow == OVERFLOW_BLOCK:
+            self._put_blocking(entry, ack)
+        elif self._overflow == OVERFLOW_DROP_OLDEST:
+            while not self._budget.acquire(len(entry)):
                 try:
-                    self._entries.get_nowait()
+                    self._release(self._entries.get_nowait())
                 except Queue.Empty:
-                    pass
+                    # The memory is used by other transports
+                    self._drop()
+                    return
+                self._drop()
+            self._entries.put((entry, ack))
+        elif self._budget.acquire(len(entry)):
+            self._entries.put((entry, ack))
+        else:
+            self._drop()
+
+    def _put_blocking(self, entry, ack=None):
+        """Waits for memory for the entry and queues it."""
+        while not self._shutdown:
+            if self._budget.acquire(len(entry), 1):
+                self._entries.put((entry, ack))
+                return
+
+    def _defer(self, ack):
+        """Keeps the ack of a spilled entry until entries queued in memory
+        before it have been sent."""
+        if ack:
+            self._spilled_acks_lock.acquire()
+            try:
+                self._spilled_acks.append(ack)
+            finally:
+                self._spilled_acks_lock.release()
+
+    def _take_spilled_acks(self):
+        self._spilled_acks_lock.acquire()
+        try:
+            acks = self._spilled_acks
+            self._spilled_acks = []
+        finally:
+            self._spilled_acks_lock.release()
+        return acks
+
+    def _release(self, item):
+        """Releases memory of the queued (entry, ack) item."""
+        self._budget.release(len(item[0]))
+        return item
+
+    def _acknowledge(self, acks):
+        for ack in acks:
+            if ack:
+                try:
+                    ack()
+                except Exception:
+                    log.error("Exception in acknowledgement: %s", traceback.format_exc())
+
+    def _drop(self):
+        if not self._dropped:
+            log.warning("Send queue of %s:%s is full, dropping entries", self.endpoint, self.port)
+        self._dropped += 1
+
+    def send_block(self, entries, block=False, ack=None):
+        """Sends entries joined into a single string. With block, it waits
+        for space in the queue instead of dropping entries. The ack is called
+        as with send."""
+        if not block or self._spill:
+            # Entries which do not fit are spilled behind the ones spilled
+            # before, which keeps them in order
+            self.send(entries, ack)
+            return
+        self._put_blocking(entries, ack)
+        if self._pool:
+            self._pool.notify(self)
+
+    def offer_block(self, entries, ack=None):
+        """Queues entries joined into a single string if there is room for
+        them in the queue or on disk. Returns False, without calling the ack,
+        if they have to be offered again later."""
+        if self._spill:
+            self._queue(entries, ack)
+        elif self._budget.acquire(len(entries)):
+            self._entries.put((entries, ack))
+        else:
+            return False
+        if self._pool:
+            self._pool.notify(self)
+        return True
 
     def close(self):
         self._shutdown = True
-        self._worker.join(1.5)
+        if self._worker:
+            self._worker.join(1.5)
+        else:
+            self._pool.wait(self, 1.5)
+        if self._spill:
+            # Entries queued in memory are older than the spilled ones. The
+            # worker may still be sending its batch, it is saved as well.
+            entries = []
+            acks = []
+            self._unsent_lock.acquire()
+            try:
+                if self._unsent:
+                    entries.append(self._unsent[0])
+                    acks.extend(self._unsent[1])
+                    self._unsent = None
+            finally:
+                self._unsent_lock.release()
+            try:
+                while True:
+                    entry, ack = self._release(self._entries.get_nowait())
+                    entries.append(entry)
+                    acks.append(ack)
+            except Queue.Empty:
+                pass
+            try:
+                self._spill.put_front(entries)
+                self._spill.close()
+                self._acknowledge(acks + self._take_spilled_acks())
+            except (IOError, OSError), e:
+                log.warning("Cannot save unsent entries: %s", e.strerror)
+        if self._dropped:
+            log.warning("Dropped %d entries for %s:%s", self._dropped, self.endpoint, self.port)
+
+    def _next_entry(self, block=True):
+        """Returns the next (entry, ack) to send, spilled entries are taken
+        when the memory queue is empty. Raises Queue.Empty if there is
+        none."""
+        if self._spill:
+            try:
+                return self._release(self._entries.get_nowait())
+            except Queue.Empty:
+                entry = self._spill.get()
+                if entry is not None:
+                    # Entries queued in memory before the spilled ones have
+                    # all been taken, their batches are sent before this one
+                    acks = self._take_spilled_acks()
+                    if acks:
+                        return entry, functools.partial(self._acknowledge, acks)
+                    return entry, None
+        return self._release(self._entries.get(block, 1))
+
+    def _next_batch(self, block=True):
+        """Returns queued entries joined into one buffer so that they are
+        sent with a single write, and their acks. Collecting stops when the
+        queue is empty, after SEND_BATCH_SIZE bytes or after
+        SEND_BATCH_LATENCY. Raises Queue.Empty if there is no entry."""
+        entry, ack = self._next_entry(block)
+        entries = [entry]
+        acks = [ack]
+        size = len(entry)
+        deadline = time.time() + SEND_BATCH_LATENCY
+        while size < SEND_BATCH_SIZE and time.time() < deadline:
+            try:
+                entry, ack = self._next_entry(False)
+            except Queue.Empty:
+                break
+            entries.append(entry)
+            acks.append(ack)
+            size += len(entry)
+        return ''.join(entries), [x for x in acks if x]
+
+    def _send_batch(self, unsent):
+        """Sends the (batch, acks) and acknowledges it. Until it is sent,
+        the batch is kept where close can take it."""
+        self._unsent = unsent
+        if not self._send_entry(unsent[0]):
+            return
+        self._unsent_lock.acquire()
+        try:
+            if self._unsent is not unsent:
+                # Saved by close in the meantime, acknowledged there
+                return
+            self._unsent = None
+        finally:
+            self._unsent_lock.release()
+        self._acknowledge(unsent[1])
 
     def run(self):
         """When run with backgroud thread it collects entries from internal
@@ -1641,22 +2579,66 @@ class Transport(object):
         self._open_connection()
         while not self._shutdown:
             try:
-                entry = self._entries.get(True, 1)
-                self._send_entry(entry)
+                self._send_batch(self._next_batch())
             except Queue.Empty:
                 pass
             except Exception:
                 log.error("Exception in run: {0}".format(traceback.format_exc()))
         self._close_connection()
 
+    def pending(self):
+        """Returns True if there are entries to send."""
+        if self._shutdown:
+            return False
+        return not self._entries.empty() or bool(self._spill and not self._spill.empty())
+
+    def serve(self, pool):
+        """Sends queued entries when driven by the connection pool. The
+        connection is opened when there is something to send and closed
+        after the pool's idle timeout. If other transports wait for a
+        connection, it is closed as soon as the queue is empty, or after the
+        pool's hold time if entries keep coming."""
+        started = time.time()
+        idle_since = started
+        while not self._shutdown:
+            waiting = pool.waiting()
+            if waiting and time.time() - started >= pool.hold_time:
+                break
+            try:
+                batch, acks = self._next_batch(not waiting)
+            except Queue.Empty:
+                if waiting or time.time() - idle_since >= pool.idle_timeout:
+                    break
+                continue
+            if not self._socket:
+                self._open_connection()
+            self._send_batch((batch, acks))
+            idle_since = time.time()
+        self._close_connection()
+
 
 class DefaultTransport(object):
+    """Transports of logs identified by tokens and of metrics. Logs are
+    spread over data-connections transports by their token so that entries
+    of each log keep their order."""
+
     def __init__(self, xconfig):
-        self._transport = None
+        self._transports = {}  # shard -> Transport
         self._config = xconfig
 
-    def get(self):
-        if not self._transport:
+    def _shards(self):
+        shards = self._config.data_connections
+        if shards == NOT_SET:
+            return 1
+        return shards
+
+    def get(self, token=None):
+        """Returns the transport for entries with the token."""
+        shard = 0
+        if token:
+            shard = (zlib.crc32(token) & 0xffffffff) % self._shards()
+        transport = self._transports.get(shard)
+        if not transport:
             use_ssl = not self._config.suppress_ssl
             if self._config.datahub:
                 endpoint = self._config.datahub_ip
@@ -1675,22 +2657,36 @@ class DefaultTransport(object):
                 endpoint = Domain.LOCAL
                 port = 10000
                 use_ssl = False
-            self._transport = Transport(
-                endpoint, port, use_ssl, '', self._config.debug_transport_events)
-        return self._transport
+            # The first transport takes over entries spilled by shards beyond the current count
+            shards = None
+            if not self._transports:
+                shards = self._shards()
+            transport = self._transports[shard] = Transport(
+                endpoint, port, use_ssl, '', self._config.debug_transport_events, shard=shard,
+                compress=self._config.compress, shards=shards)
+        return transport
 
     def close(self):
-        if self._transport:
-            self._transport.close()
+        for transport in self._transports.itervalues():
+            transport.close()
 
 
 class ConfiguredLog(object):
-    def __init__(self, name, token, destination, path, send_s3):
+    def __init__(self, name, token, destination, path, send_s3, follow_all=False, multiline=None,
+                 from_beginning=False, json_format=None):
         self.name = name
         self.token = token
         self.destination = destination
         self.path = path
         self.send_s3 = send_s3
+        self.follow_all = follow_all
+        self.from_beginning = from_beginning
+        if multiline is None:
+            multiline = MultilineConfig()
+        self.multiline = multiline
+        if json_format is None:
+            json_format = formatters.JSONConfig()
+        self.json_format = json_format
         self.logset = None
         self.set_key = None
         self.log_key = None
@@ -1717,6 +2713,18 @@ class Config(object):
         self.datahub_port = NOT_SET
         self.system_stats_token = NOT_SET
         self.pull_server_side_config = NOT_SET
+        self.inotify = True
+        self.tail_workers = NOT_SET
+        self.checkpoints = True
+        self.from_start = False
+        self.spill_max_size = NOT_SET
+        self.send_queue_memory = NOT_SET
+        self.queue_overflow = NOT_SET
+        self.key_connections = NOT_SET
+        self.data_connections = NOT_SET
+        self.event_loop = False
+        self.workers = NOT_SET
+        self.compress = False
         self.configured_logs = []
         self.metrics = metrics.MetricsConfig()
 
@@ -1735,6 +2743,7 @@ class Config(object):
         self.uuid = False
         self.xlist = False
         self.yes = False
+        self.worker_index = 0
 
         # Debug options
 
@@ -1822,7 +2831,18 @@ class Config(object):
                 DATAHUB_PARAM: '',
                 SYSSTAT_TOKEN_PARAM: '',
                 HOSTNAME_PARAM: '',
-                PULL_SERVER_SIDE_CONFIG_PARAM: 'True'
+                PULL_SERVER_SIDE_CONFIG_PARAM: 'True',
+                INOTIFY_PARAM: 'True',
+                TAIL_WORKERS_PARAM: '',
+                CHECKPOINTS_PARAM: 'True',
+                SPILL_MAX_SIZE_PARAM: '',
+                SEND_QUEUE_MEMORY_PARAM: '',
+                QUEUE_OVERFLOW_PARAM: '',
+                KEY_CONNECTIONS_PARAM: '',
+                DATA_CONNECTIONS_PARAM: '',
+                EVENT_LOOP_PARAM: 'False',
+                WORKERS_PARAM: '',
+                COMPRESS_PARAM: 'False'
             })
             Config.fix_sections_names_format(self.config_filename)
             conf.read(self.config_filename)
@@ -1853,6 +2873,28 @@ class Config(object):
             new_suppress_ssl = conf.get(MAIN_SECT, SUPPRESS_SSL_PARAM)
             if new_suppress_ssl == 'True':
                 self.suppress_ssl = new_suppress_ssl == 'True'
+            if conf.get(MAIN_SECT, INOTIFY_PARAM) == 'False':
+                self.inotify = False
+            if self.tail_workers == NOT_SET:
+                self.set_tail_workers(conf.get(MAIN_SECT, TAIL_WORKERS_PARAM), should_die=False)
+            if conf.get(MAIN_SECT, CHECKPOINTS_PARAM) == 'False':
+                self.checkpoints = False
+            if self.spill_max_size == NOT_SET:
+                self.set_spill_max_size(conf.get(MAIN_SECT, SPILL_MAX_SIZE_PARAM), should_die=False)
+            if self.send_queue_memory == NOT_SET:
+                self.set_send_queue_memory(conf.get(MAIN_SECT, SEND_QUEUE_MEMORY_PARAM), should_die=False)
+            if self.queue_overflow == NOT_SET:
+                self.set_queue_overflow(conf.get(MAIN_SECT, QUEUE_OVERFLOW_PARAM), should_die=False)
+            if self.key_connections == NOT_SET:
+                self.set_key_connections(conf.get(MAIN_SECT, KEY_CONNECTIONS_PARAM), should_die=False)
+            if self.data_connections == NOT_SET:
+                self.set_data_connections(conf.get(MAIN_SECT, DATA_CONNECTIONS_PARAM), should_die=False)
+            if conf.get(MAIN_SECT, EVENT_LOOP_PARAM) == 'True':
+                self.event_loop = True
+            if self.workers == NOT_SET:
+                self.set_workers(conf.get(MAIN_SECT, WORKERS_PARAM), should_die=False)
+            if conf.get(MAIN_SECT, COMPRESS_PARAM) == 'True':
+                self.compress = True
             new_force_domain = conf.get(MAIN_SECT, FORCE_DOMAIN_PARAM)
             if new_force_domain:
                 self.force_domain = new_force_domain
@@ -1988,7 +3030,35 @@ class Config(object):
                 except ConfigParser.NoOptionError:
                     pass
 
-                configured_log = ConfiguredLog(name, token, destination, path, send_s3.lower() == 'true')
+                follow_all = 'False'
+                try:
+                    follow_all = conf.get(name, FOLLOW_ALL_PARAM)
+                except ConfigParser.NoOptionError:
+                    pass
+
+                start = ''
+                try:
+                    start = conf.get(name, START_PARAM)
+                except ConfigParser.NoOptionError:
+                    pass
+
+                multiline = MultilineConfig()
+                try:
+                    multiline.load(conf, name)
+                except ValueError, e:
+                    log.error("Ignoring multiline configuration in section `%s': %s", name, e)
+                    multiline = MultilineConfig()
+
+                json_format = formatters.JSONConfig()
+                try:
+                    json_format.load(conf, name)
+                except ValueError, e:
+                    log.error("Ignoring format configuration in section `%s': %s", name, e)
+                    json_format = formatters.JSONConfig()
+
+                configured_log = ConfiguredLog(name, token, destination, path, send_s3.lower() == 'true',
+                                               follow_all.lower() == 'true', multiline,
+                                               start == START_BEGINNING, json_format)
 
                 self.configured_logs.append(configured_log)
 
@@ -2019,6 +3089,28 @@ class Config(object):
             if self.pull_server_side_config != NOT_SET:
                 conf.set(MAIN_SECT, PULL_SERVER_SIDE_CONFIG_PARAM, "%s" %
                          self.pull_server_side_config)
+            if not self.inotify:
+                conf.set(MAIN_SECT, INOTIFY_PARAM, 'False')
+            if self.tail_workers != NOT_SET:
+                conf.set(MAIN_SECT, TAIL_WORKERS_PARAM, str(self.tail_workers))
+            if not self.checkpoints:
+                conf.set(MAIN_SECT, CHECKPOINTS_PARAM, 'False')
+            if self.spill_max_size != NOT_SET:
+                conf.set(MAIN_SECT, SPILL_MAX_SIZE_PARAM, str(self.spill_max_size))
+            if self.send_queue_memory != NOT_SET:
+                conf.set(MAIN_SECT, SEND_QUEUE_MEMORY_PARAM, str(self.send_queue_memory))
+            if self.queue_overflow != NOT_SET:
+                conf.set(MAIN_SECT, QUEUE_OVERFLOW_PARAM, self.queue_overflow)
+            if self.key_connections != NOT_SET:
+                conf.set(MAIN_SECT, KEY_CONNECTIONS_PARAM, str(self.key_connections))
+            if self.data_connections != NOT_SET:
+                conf.set(MAIN_SECT, DATA_CONNECTIONS_PARAM, str(self.data_connections))
+            if self.event_loop:
+                conf.set(MAIN_SECT, EVENT_LOOP_PARAM, 'True')
+            if self.workers != NOT_SET:
+                conf.set(MAIN_SECT, WORKERS_PARAM, str(self.workers))
+            if self.compress:
+                conf.set(MAIN_SECT, COMPRESS_PARAM, 'True')
             if self.datahub != NOT_SET:
                 conf.set(MAIN_SECT, DATAHUB_PARAM, self.datahub)
             if self.system_stats_token != NOT_SET:
@@ -2042,6 +3134,12 @@ class Config(object):
                 if clog.destination:
                     conf.set(clog.name, DESTINATION_PARAM, clog.destination)
                 conf.set(clog.name, SEND_S3_PARAM, str(clog.send_s3))
+                if clog.follow_all:
+                    conf.set(clog.name, FOLLOW_ALL_PARAM, 'True')
+                if clog.from_beginning:
+                    conf.set(clog.name, START_PARAM, START_BEGINNING)
+                clog.multiline.save(conf, clog.name)
+                clog.json_format.save(conf, clog.name)
 
             self.metrics.save(conf)
 
@@ -2193,6 +3291,88 @@ class Config(object):
                     values[1])
         self.datahub = value
 
+    def set_tail_workers(self, value, should_die=True):
+        if not value and not should_die:
+            return
+        try:
+            self.tail_workers = int(value)
+            if self.tail_workers < 0:
+                raise ValueError
+        except ValueError:
+            die("Cannot parse %s as number of tail workers" % value)
+
+    def set_spill_max_size(self, value, should_die=True):
+        if not value and not should_die:
+            return
+        try:
+            self.spill_max_size = int(value)
+            if self.spill_max_size <= 0:
+                raise ValueError
+        except ValueError:
+            die("Cannot parse %s as spill size in MB" % value)
+
+    def set_send_queue_memory(self, value, should_die=True):
+        if not value and not should_die:
+            return
+        try:
+            self.send_queue_memory = int(value)
+            if self.send_queue_memory <= 0:
+                raise ValueError
+        except ValueError:
+            die("Cannot parse %s as send queue memory in MB" % value)
+
+    def set_queue_overflow(self, value, should_die=True):
+        if not value and not should_die:
+            return
+        if value not in OVERFLOW_POLICIES:
+            die("Queue overflow must be one of %s" % ', '.join(OVERFLOW_POLICIES))
+        self.queue_overflow = value
+
+    def set_key_connections(self, value, should_die=True):
+        if not value and not should_die:
+            return
+        try:
+            self.key_connections = int(value)
+            if self.key_connections <= 0:
+                raise ValueError
+        except ValueError:
+            die("Cannot parse %s as number of connections" % value)
+
+    def set_data_connections(self, value, should_die=True):
+        if not value and not should_die:
+            return
+        try:
+            self.data_connections = int(value)
+            if self.data_connections <= 0:
+                raise ValueError
+        except ValueError:
+            die("Cannot parse %s as number of connections" % value)
+
+    def set_workers(self, value, should_die=True):
+        if not value and not should_die:
+            return
+        try:
+            self.workers = int(value)
+            if self.workers <= 0:
+                raise ValueError
+        except ValueError:
+            die("Cannot parse %s as number of worker processes" % value)
+
+    def get_worker_count(self):
+        """Returns number of processes followed logs are split between."""
+        if self.workers == NOT_SET:
+            return 1
+        return self.workers
+
+    def get_queue_overflow(self):
+        """Returns the queue overflow policy, entries are spilled by default
+        if the spill size is set."""
+        if self.queue_overflow != NOT_SET:
+            return self.queue_overflow
+        if self.spill_max_size != NOT_SET:
+            return OVERFLOW_SPILL
+        return OVERFLOW_DROP_OLDEST
+
     def process_params(self, params):
         """
         Parses command line parameters and updates config parameters accordingly
@@ -2203,7 +3383,9 @@ class Config(object):
                     debug-stats-only debug-cmds debug-system help version yes force uuid list
                     std std-all name= hostname= type= pid-file= debug no-defaults
                     suppress-ssl use-ca-provided force-api-host= force-domain=
-                    system-stat-token= datahub= pull-server-side-config= config="""
+                    system-stat-token= datahub= pull-server-side-config= config= no-inotify tail-workers= no-checkpoints from-start
+                    spill-max-size= send-queue-memory= queue-overflow= key-connections=
+                    data-connections= event-loop workers= compress"""
         try:
             optlist, args = getopt.gnu_getopt(params, '', param_list.split())
         except getopt.GetoptError, err:
@@ -2291,6 +3473,30 @@ class Config(object):
                 self.pull_server_side_config = value == "True"
             elif name == "--datahub":
                 self.set_datahub_settings(value)
+            elif name == "--no-inotify":
+                self.inotify = False
+            elif name == "--tail-workers":
+                self.set_tail_workers(value)
+            elif name == "--no-checkpoints":
+                self.checkpoints = False
+            elif name == "--from-start":
+                self.from_start = True
+            elif name == "--spill-max-size":
+                self.set_spill_max_size(value)
+            elif name == "--send-queue-memory":
+                self.set_send_queue_memory(value)
+            elif name == "--queue-overflow":
+                self.set_queue_overflow(value)
+            elif name == "--key-connections":
+                self.set_key_connections(value)
+            elif name == "--data-connections":
+                self.set_data_connections(value)
+            elif name == "--event-loop":
+                self.event_loop = True
+            elif name == "--workers":
+                self.set_workers(value)
+            elif name == "--compress":
+                self.compress = True
 
         if self.datahub_ip and not self.datahub_port:
             if self.suppress_ssl:
@@ -2312,6 +3518,33 @@ config = Config()
 # Amazon S3 backend instance
 amazon_s3_backend = None
 
+# Shared inotify instance, None if followers poll their files
+file_notifier = None
+
+# Directory listings shared by followers with wildcard names
+glob_index = GlobIndex()
+
+# Shared tail engine, None if each follower runs in its own thread
+tail_engine = None
+
+# Offsets of followed files, None if followers start at the end of files
+checkpoint_store = None
+
+# Memory of send queues shared by all transports
+send_budget = None
+
+# Connections of logs identified by log keys, created with the first such log
+connection_pool = None
+
+# Resolved addresses of endpoints shared by transports
+address_cache = AddressCache(DNS_CACHE_TTL)
+
+# Timer loop of periodic tasks, None if each task uses timer threads
+scheduler = None
+
+# Loops of a worker process which have to make progress for its heartbeats
+worker_progress = Progress()
+
 
 def do_request(conn, operation, addr, data=None, headers={}):
     log.debug('Domain request: %s %s %s %s', operation, addr, data, headers)
@@ -2861,10 +4094,12 @@ def start_followers(default_transport):
     """
     Loads logs from the server (or configuration) and initializes followers.
     """
+    global connection_pool
     noticed = False
     logs = []
     followers = []
     transports = []
+    host_name = local_host_name()
 
     if config.pull_server_side_config:
         # Use LE server as the source for list of followed logs
@@ -2894,7 +4129,8 @@ def start_followers(default_transport):
         # returned by LE Server.
         logs.append(
             {'type': 'token', 'name': log_name, 'filename': log_path, 'key': '', 'token': log_token, 'send_s3': send_s3,
-             'follow': 'true'})
+             'follow': 'true', 'follow_all': cl.follow_all, 'multiline': cl.multiline,
+             'from_beginning': cl.from_beginning, 'json_format': cl.json_format})
 
     available_filters = {}
     filter_filenames = default_filter_filenames
@@ -2917,6 +4153,11 @@ def start_followers(default_transport):
     global amazon_s3_backend
     amazon_s3_backend = AmazonS3ArchivingBackend(False, False, False, config)
 
+    # Each worker process follows its share of logs
+    workers = config.get_worker_count()
+    if workers > 1:
+        logs = [l for l in logs if (zlib.crc32(l['filename']) & 0xffffffff) % workers == config.worker_index]
+
     # Start followers
     for l in logs:
         # Note! Token-type logs have follow param == false by default, so we need to
@@ -2945,11 +4186,15 @@ def start_followers(default_transport):
 
             log.info("Following %s", log_filename)
 
+            json_format = l.get('json_format')
             if log_token or config.datahub:
-                formatter = formatters.FormatSyslog(
-                    config.hostname, log_name, log_token, config.datahub)  # Do not prepend the token if
-                # data goes to DH
-                transport = default_transport.get()
+                if json_format and json_format.enabled():
+                    formatter = json_format.formatter(config.hostname, log_name, log_token, config.datahub)
+                else:
+                    formatter = formatters.FormatSyslog(
+                        config.hostname, log_name, log_token, config.datahub)  # Do not prepend the token if
+                    # data goes to DH
+                transport = default_transport.get(log_token or log_name)
             elif log_key:
                 endpoint = Domain.API
                 port = 443
@@ -2964,17 +4209,32 @@ def start_followers(default_transport):
                     use_ssl = False
                 preamble = 'PUT /%s/hosts/%s/%s/?realtime=1 HTTP/1.0\r\n\r\n' % (
                     config.user_key, config.agent_key, log_key)
-                formatter = formatters.FormatPlain('')
+                if json_format and json_format.enabled():
+                    formatter = json_format.formatter(config.hostname, log_name, '')
+                else:
+                    formatter = formatters.FormatPlain('')
+                if not connection_pool:
+                    key_connections = config.key_connections
+                    if key_connections == NOT_SET:
+                        key_connections = KEY_CONNECTIONS
+                    connection_pool = ConnectionPool(key_connections, KEY_CONNECTION_IDLE, KEY_CONNECTION_HOLD)
                 transport = Transport(endpoint, port, use_ssl, preamble,
-                                      config.debug_transport_events)
+                                      config.debug_transport_events, connection_pool)
                 transports.append(transport)
             else:
                 continue
 
             # Instantiate the follower
             # None is the TAG, which currently is not used
-            follower = Follower(log_filename, entry_filter, transport,
-                                formatter, log_token, None, log_send_s3, amazon_s3_backend)
+            from_beginning = config.from_start or l.get('from_beginning', False)
+            if l.get('follow_all') and tail_engine:
+                follower = MultiFollower(log_filename, entry_filter, transport,
+                                         formatter, log_token, log_send_s3, amazon_s3_backend, tail_engine,
+                                         l.get('multiline'), from_beginning, host_name)
+            else:
+                follower = Follower(log_filename, entry_filter, transport,
+                                    formatter, log_token, None, log_send_s3, amazon_s3_backend, tail_engine,
+                                    multiline=l.get('multiline'), catch_up=from_beginning, host_name=host_name)
             followers.append(follower)
     return (followers, transports)
 
@@ -3036,8 +4296,6 @@ def cmd_monitor(args):
     """
     no_more_args(args)
     config.load()
-    stats = None
-    smetrics = None
 
     # We need account and host ID to get server side configuration
     if config.pull_server_side_config:
@@ -3052,18 +4310,86 @@ def cmd_monitor(args):
     if config.daemon:
         daemonize()
 
+    if config.get_worker_count() > 1:
+        # Split followed logs between processes to use more cores
+        Supervisor(config.workers, monitor_worker, WORKER_HEARTBEAT_TIMEOUT, worker_progress).run()
+    else:
+        monitor()
+
+
+def monitor_worker(index):
+    """Runs in a worker process started by the supervisor."""
+    config.worker_index = index
+    set_proc_title('logentries-worker-%d' % index)
+    monitor()
+
+
+def monitor():
+    """Follows logs and collects metrics until interrupted."""
+    stats = None
+    smetrics = None
+
+    # Wait for file changes with inotify if possible
+    global file_notifier
+    if config.inotify and inotify_available:
+        try:
+            file_notifier = FileNotifier(INOTIFY_RECHECK)
+            glob_index.watch(file_notifier)
+        except OSError, e:
+            log.warning("Cannot initialize inotify, polling files instead: %s", e.strerror)
+
+    # Run periodic tasks from a single thread instead of a timer thread each
+    global scheduler
+    if config.event_loop:
+        scheduler = Scheduler()
+
+    # Resume followed files where the previous run stopped
+    global checkpoint_store
+    if config.checkpoints:
+        checkpoints_name = CHECKPOINTS_NAME
+        if config.get_worker_count() > 1:
+            checkpoints_name += '.%d' % config.worker_index
+        checkpoint_store = CheckpointStore(config.config_dir_name + checkpoints_name, CHECKPOINT_INTERVAL,
+                                           scheduler)
+
+    # Follow files with a fixed pool of threads if requested
+    global tail_engine
+    tail_workers = config.tail_workers
+    if not tail_workers and (config.event_loop or [x for x in config.configured_logs if x.follow_all]):
+        # Files matched by follow_all patterns are always followed by the engine
+        tail_workers = 1
+    if tail_workers:
+        tail_engine = TailEngine(tail_workers, file_notifier, TAIL_RECHECK)
+
+    # Heartbeats of a worker process stop when its loops hang
+    if config.get_worker_count() > 1:
+        if scheduler:
+            worker_progress.register('scheduler', lambda tick: scheduler.call_later(0, tick))
+        if tail_engine:
+            for index in range(tail_workers):
+                worker_progress.register('tail-engine-%d' % index,
+                                         functools.partial(tail_engine.call_soon, index))
+
+    # Bound memory of entries waiting to be sent
+    global send_budget
+    send_queue_memory = config.send_queue_memory
+    if send_queue_memory == NOT_SET:
+        send_queue_memory = SEND_QUEUE_MEMORY
+    send_budget = MemoryBudget(send_queue_memory * 1024 * 1024)
+
     # Start default transport channel
     default_transport = DefaultTransport(config)
 
-    # Register resource monitoring
-    if config.agent_key != NOT_SET:
-        stats = Stats()
-        stats.start()
-    formatter = formatters.FormatSyslog(config.hostname, 'le',
-                                        config.metrics.token)
-    smetrics = metrics.Metrics(config.metrics, default_transport,
-                               formatter, config.debug_metrics)
-    smetrics.start()
+    # Register resource monitoring, done by the first worker process only
+    if config.worker_index == 0:
+        if config.agent_key != NOT_SET:
+            stats = Stats(scheduler)
+            stats.start()
+        formatter = formatters.FormatSyslog(config.hostname, 'le',
+                                            config.metrics.token)
+        smetrics = metrics.Metrics(config.metrics, default_transport,
+                                   formatter, config.debug_metrics, scheduler)
+        smetrics.start()
 
     followers = []
     transports = []
@@ -3092,10 +4418,20 @@ def cmd_monitor(args):
     # Close followers
     for follower in followers:
         follower.close()
-    # Close transports
+    if tail_engine:
+        tail_engine.close()
+    if file_notifier:
+        file_notifier.close()
+    # Close transports, they confirm checkpoints of entries sent or spilled
     for transport in transports:
         transport.close()
+    if connection_pool:
+        connection_pool.close()
     default_transport.close()
+    if checkpoint_store:
+        checkpoint_store.close()
+    if scheduler:
+        scheduler.close()
 
 
 def cmd_monitor_daemon(args):
@@ -0,0 +1,60 @@
+# coding: utf-8
+# vim: set ts=4 sw=4 et:
+
+"""
+Memory budget shared by send queues.
+
+Each queued entry is accounted with its size plus a fixed overhead, so the
+memory used by all queues together stays below the limit regardless of how
+many transports there are and how large their entries are.
+"""
+
+import threading
+import time
+
+__author__ = 'Logentries'
+
+__all__ = ['MemoryBudget']
+
+# Memory used by a queued entry in addition to its content
+ENTRY_OVERHEAD = 64  # Bytes
+
+
+class MemoryBudget(object):
+    """Number of bytes available to queued entries. Safe to be used from
+    multiple threads."""
+
+    def __init__(self, limit):
+        self._limit = limit
+        self._used = 0
+        self._cond = threading.Condition(threading.Lock())
+
+    def acquire(self, size, timeout=0):
+        """Reserves memory for an entry of the size, waiting up to timeout
+        seconds for other entries to be released. Returns True on success.
+        An entry larger than the limit fits only if nothing else is queued."""
+        size += ENTRY_OVERHEAD
+        deadline = time.time() + timeout
+        self._cond.acquire()
+        try:
+            while self._used and self._used + size > self._limit:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self._used += size
+            return True
+        finally:
+            self._cond.release()
+
+    def release(self, size):
+        """Returns memory of a dequeued entry of the size."""
+        self._cond.acquire()
+        try:
+            self._used -= size + ENTRY_OVERHEAD
+            self._cond.notify_all()
+        finally:
+            self._cond.release()
+
+    def used(self):
+        return self._used
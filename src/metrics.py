@@ -436,9 +436,11 @@ class Metrics(object):
 
     """Metrics collecting class."""
 
-    def __init__(self, conf, default_transport, formatter, debug):
-        """Creates an instance of metrics from the configuration."""
+    def __init__(self, conf, default_transport, formatter, debug, scheduler=None):
+        """Creates an instance of metrics from the configuration. Collection
+        runs on the shared scheduler if given, otherwise on timer threads."""
         self._ready = False
+        self._scheduler = scheduler
         if not psutil_available:
             if debug:
                 report("Warning: Cannot instantiate metrics, psutil library is not available.")
@@ -520,7 +522,11 @@ class Metrics(object):
         # TODO - align metrics on time boundary
         ethalon += self._interval
         next_step = (ethalon - time.time()) % self._interval
-        if not self._shutdown:
+        if self._shutdown:
+            return
+        if self._scheduler:
+            self._timer = self._scheduler.call_later(next_step, self._collect_metrics)
+        else:
             self._timer = threading.Timer(next_step, self._collect_metrics, ())
             self._timer.daemon = True
             self._timer.start()
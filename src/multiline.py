@@ -0,0 +1,130 @@
+# coding: utf-8
+# vim: set ts=4 sw=4 et:
+
+"""
+Assembly of multi-line events such as stack traces.
+
+Lines of an event are joined with the Unicode line separator so that the
+event is sent and displayed as one entry. A new event starts with a line
+matching the start pattern, or with a line which is not indented when the
+indentation rule is used.
+"""
+
+import ConfigParser
+import re
+import time
+
+__author__ = 'Logentries'
+
+__all__ = ['MultilineConfig', 'MultilineAssembler']
+
+# Configuration parameters, prefixed in log sections
+PREFIX = 'multiline-'
+START = 'start'
+INDENT = 'indent'
+MAX_LINES = 'max-lines'
+MAX_BYTES = 'max-bytes'
+TIMEOUT = 'timeout'
+
+# Separator of lines in an event, U+2028 encoded in UTF-8
+LINE_SEPARATOR = u'\u2028'.encode('utf-8')
+
+
+class MultilineConfig(object):
+
+    """Multiline configuration of a log section."""
+
+    DEFAULTS = {
+        START: '',
+        INDENT: 'False',
+        MAX_LINES: '500',
+        MAX_BYTES: '65536',
+        TIMEOUT: '1',
+    }
+
+    def __init__(self):
+        self.values = dict(self.DEFAULTS)
+
+    def load(self, conf, section):
+        """Loads multiline configuration of the section. Raises ValueError if
+        the configuration is not valid."""
+        for item in self.DEFAULTS:
+            try:
+                self.values[item] = conf.get(section, PREFIX + item)
+            except ConfigParser.NoOptionError:
+                pass
+        # Validate now rather than when the first file is opened
+        if self.enabled():
+            self.assembler()
+
+    def save(self, conf, section):
+        """Saves values which differ from defaults."""
+        for item in self.DEFAULTS:
+            if self.values[item] != self.DEFAULTS[item]:
+                conf.set(section, PREFIX + item, self.values[item])
+
+    def enabled(self):
+        return bool(self.values[START]) or self.values[INDENT].lower() == 'true'
+
+    def assembler(self):
+        """Returns a new assembler for a followed file."""
+        try:
+            pattern = None
+            if self.values[START]:
+                pattern = re.compile(self.values[START])
+            return MultilineAssembler(pattern, int(self.values[MAX_LINES]),
+                                      int(self.values[MAX_BYTES]), float(self.values[TIMEOUT]))
+        except re.error, e:
+            raise ValueError("Invalid %s%s pattern: %s" % (PREFIX, START, e))
+
+
+class MultilineAssembler(object):
+    """Joins lines into events. Without the start pattern, indented lines
+    continue the previous event."""
+
+    def __init__(self, pattern, max_lines, max_bytes, timeout):
+        self._pattern = pattern
+        self._max_lines = max_lines
+        self._max_bytes = max_bytes
+        self._timeout = timeout
+        self._lines = []
+        self._size = 0
+        self._updated = 0
+
+    def _is_start(self, line):
+        if self._pattern:
+            return self._pattern.match(line) is not None
+        return line[:1] not in (' ', '\t')
+
+    def _join(self):
+        lines = self._lines
+        self._lines = []
+        self._size = 0
+        if len(lines) == 1:
+            return lines[0]
+        return LINE_SEPARATOR.join([line.rstrip('\n') for line in lines]) + '\n'
+
+    def feed(self, lines):
+        """Adds lines and returns list of events completed by them. The last
+        event is held back until its end is known."""
+        events = []
+        for line in lines:
+            if self._lines and (self._is_start(line) or len(self._lines) >= self._max_lines or
+                                self._size + len(line) > self._max_bytes):
+                events.append(self._join())
+            self._lines.append(line)
+            self._size += len(line)
+        if lines:
+            self._updated = time.time()
+        return events
+
+    def pending(self):
+        """Returns number of bytes held back."""
+        return self._size
+
+    def flush(self, force=False):
+        """Returns the held back event as a list if no line has been added
+        for the timeout or if forced."""
+        if self._lines and (force or time.time() - self._updated >= self._timeout):
+            return [self._join()]
+        return []
@@ -0,0 +1,89 @@
+# coding: utf-8
+# vim: set ts=4 sw=4 et:
+
+"""
+Cache of resolved addresses of endpoints.
+
+Transports look up their endpoint on every connection attempt. Addresses are
+kept for a while and, once expired, still returned while a background thread
+resolves them again, so a slow resolver delays only the very first
+connection.
+"""
+
+import logging
+import socket
+import threading
+import time
+
+__author__ = 'Logentries'
+
+__all__ = ['AddressCache']
+
+LOG_LE_AGENT = 'logentries.com'
+log = logging.getLogger(LOG_LE_AGENT)
+
+
+def _resolve(host, port):
+    """Returns IPv4 addresses of the host, raises socket.error on failure."""
+    addresses = []
+    for info in socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM):
+        if info[4][0] not in addresses:
+            addresses.append(info[4][0])
+    return addresses
+
+
+class AddressCache(object):
+    """Resolves host names with cached results. Safe to be used from multiple
+    threads."""
+
+    def __init__(self, ttl, resolve=_resolve):
+        self._ttl = ttl
+        self._resolve = resolve
+        self._lock = threading.Lock()
+        self._entries = {}  # (host, port) -> [addresses, expires]
+        self._refreshing = set()
+
+    def lookup(self, host, port):
+        """Returns a non-empty list of addresses of the host. Raises
+        socket.error if the host is not in the cache and cannot be
+        resolved."""
+        key = (host, port)
+        self._lock.acquire()
+        try:
+            entry = self._entries.get(key)
+            if entry and entry[1] <= time.time() and key not in self._refreshing:
+                self._refreshing.add(key)
+                t = threading.Thread(target=self._refresh, args=(key,), name='resolver')
+                t.daemon = True
+                t.start()
+        finally:
+            self._lock.release()
+        if entry:
+            return entry[0]
+
+        addresses = self._resolve(host, port)
+        if not addresses:
+            raise socket.gaierror(socket.EAI_NONAME, "No address found for %s" % host)
+        self._lock.acquire()
+        try:
+            self._entries[key] = [addresses, time.time() + self._ttl]
+        finally:
+            self._lock.release()
+        return addresses
+
+    def _refresh(self, key):
+        try:
+            addresses = self._resolve(*key)
+        except socket.error, e:
+            log.debug("Cannot resolve %s, using cached addresses: %s", key[0], e)
+            addresses = None
+        self._lock.acquire()
+        try:
+            entry = self._entries[key]
+            if addresses:
+                entry[0] = addresses
+            # After a failure the old addresses are tried again for another ttl
+            entry[1] = time.time() + self._ttl
+            self._refreshing.discard(key)
+        finally:
+            self._lock.release()
@@ -25,11 +25,69 @@ LOG_FILE_MAX_SIZE = 50 * 1024 * 1024  # 50 Mb
 LOG_FILE_MAX_DATES_DISTANCE_HOURS = 3  # 3 hours
 MAX_FILE_NAME_INDEX = 10  # Max. index for file rotating name generation.
 
-DATA_QUEUE_CONSUMER_EVT_TIMEOUT = 0.2  # 200 ms
-DATA_QUEUE_FREE_WAIT_PERIOD = 0.1  # 100 ms
+DATA_QUEUE_STOP_TIMEOUT = 1  # 1 sec
 
-avail_features = {"event_is_set_2.6": sys.version_info >= (2, 6),
-                  "deque_k-v_params_2.7": sys.version_info >= (2, 7)}
+# Local log files are kept open; written data is flushed to disk when this much is buffered or when it is this old
+LOCAL_LOG_BUFFER_SIZE = 256 * 1024  # 256 Kb
+LOCAL_LOG_FLUSH_PERIOD = 1  # 1 sec
+
+avail_features = {"event_is_set_2.6": sys.version_info >= (2, 6)}
+
+
+class DataQueue(object):
+    """
+    Bounded queue of data items. Producers block while the queue is full; the consumer takes all queued items at
+    once. Both sides are woken by conditions instead of polling.
+    """
+
+    def __init__(self, maxlen):
+        self.maxlen = maxlen
+        self._items = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        """
+        Appends the item to the queue, waits while the queue is full.
+        """
+        self._lock.acquire()
+        try:
+            while len(self._items) >= self.maxlen:
+                self._not_full.wait()
+            self._items.append(item)
+            self._not_empty.notify()
+        finally:
+            self._lock.release()
+
+    def get_all(self, timeout):
+        """
+        Returns a list of all queued items in the order they were put to the queue. Waits up to timeout seconds for
+        an item if the queue is empty, returns an empty list if none arrives.
+        """
+        self._lock.acquire()
+        try:
+            if not self._items:
+                self._not_empty.wait(timeout)
+            items = list(self._items)
+            self._items.clear()
+            self._not_full.notify_all()
+            return items
+        finally:
+            self._lock.release()
+
+    def wakeup(self):
+        """
+        Wakes the consumer up even if the queue is empty.
+        """
+        self._lock.acquire()
+        try:
+            self._not_empty.notify()
+        finally:
+            self._lock.release()
 
 
 class AmazonS3ArchivingBackend:
@@ -37,14 +95,13 @@ class AmazonS3ArchivingBackend:
     class DataQueueProcessingWorker(threading.Thread):
         """
         The class that is responsive for grabbing data from the data queue and placing it to
-        file on local disk. Works as a separate thread trying to get new data from the queue
-        once each 200 ms.
+        file on local disk. Works as a separate thread which takes all queued data at once, as soon as
+        there is some, and writes data of each log with a single write.
         """
 
         def __init__(self, data_queue, archiving_backend):
             threading.Thread.__init__(self)
             self.need_to_stop = threading.Event()
-            self.data_consumer_event = threading.Event()
             self.data_queue = data_queue
             self.archiving_backend = archiving_backend
             self.counter = 0
@@ -56,64 +113,115 @@ class AmazonS3ArchivingBackend:
 
         def run(self):
             while not self.need_to_stop_evt_signal():
-                try:
-                    self.data_consumer_event.wait(DATA_QUEUE_CONSUMER_EVT_TIMEOUT)
-                    self.data_consumer_event.clear()
-                except:
-                    pass
+                self.write_queued_items(self.data_queue.get_all(LOCAL_LOG_FLUSH_PERIOD))
+
+                # Handles are used, flushed and closed by this thread only, so no lock is needed for them
+                self.archiving_backend.flush_local_log_files(time.time() - LOCAL_LOG_FLUSH_PERIOD)
+
+            # Items put since the last wake-up are written before the files are closed
+            self.write_queued_items(self.data_queue.get_all(0))
+            self.archiving_backend.close_local_log_files()
+
+        def write_queued_items(self, items):
+            """
+            Writes the given data items taken from the queue. Items are grouped by log; items of each log keep their
+            order.
+
+            :param items - list - data items taken from the queue:
 
+            :return:
+            """
+            groups = {}
+            for item in items:
+                groups.setdefault(item['log_name'], []).append(item)
+            for log_name, group in groups.iteritems():
                 try:
-                    while self.data_queue:
-                        item = self.data_queue.pop()
+                    self.write_items(log_name, group)
+                except Exception, e:
+                    log.error('Error: cannot write %d data items of %s. Error: %s' % (len(group), log_name, e))
+
+        def write_chunks(self, log_name, chunks):
+            """
+            Writes the given data chunks of one log with a single write. A failure is logged, the chunks are dropped.
+
+            :param log_name - str - name of the log the chunks belong to:
+            :param chunks - list - data of items of the log:
+
+            :return:
+            """
+            try:
+                self.archiving_backend.flush_data_to_local_log_file(log_name, ''.join(chunks))
+            except Exception, e:
+                if hasattr(e, 'strerror') and e.strerror:
+                    message = e.strerror
+                else:
+                    message = str(e)
+                log_object = self.archiving_backend.logs_map.get(log_name)
+                if log_object is not None:
+                    log_name = log_object['local_log_file']
+                log.error('Error: cannot write data to %s, %d data items dropped. Error: %s' %
+                          (log_name, len(chunks), message))
+
+        def write_items(self, log_name, items):
+            """
+            Writes data of the given items of one log. Data of consecutive items is joined and written at once, unless
+            the log needs to be rotated in between.
+
+            :param log_name - str - name of the log the items belong to:
+            :param items - list - data items of the log:
+
+            :return:
+            """
+            chunks = []
+            chunks_size = 0
+            for item in items:
+                if not self.archiving_backend.no_logs_rotation:
+                    log_object = self.archiving_backend.logs_map.get(log_name)
+                    if log_object is not None:
+                        new_data_chunk_size = item['size']
+                        new_timestamp = item['timestamp']
+
+                        # Check whether the current log object has backend timestamp; it may be None
+                        # if the file had been rotated during previous iteration while the current data
+                        # item resided in data queue. So if the file had been rotated we need to restore
+                        # backend timestamp. The same logic is for the first timestamp in the log (the
+                        # one which is parsed from log messages.
+                        first_log_timestamp = log_object['first_msg_ts']
+                        if first_log_timestamp is None:
+                            log_object['first_msg_ts'] = new_timestamp
+
+                        # Data joined so far is not counted in the log object's size yet
                         try:
+                            need_rotate = AmazonS3ArchivingBackend.check_rotation_needed(
+                                log_object, chunks_size + new_data_chunk_size, new_timestamp)
+                        except Exception:
+                            # Logged by check_rotation_needed; the data is written without rotation
                             need_rotate = False
-                            rotation_success = False
-                            if not self.archiving_backend.no_logs_rotation:
-                                log_name = item['log_name']
-                                log_object = self.archiving_backend.logs_map.get(log_name)
-                                if log_object is not None:
-                                    new_data_chunk_size = item['size']
-                                    new_timestamp = item['timestamp']
-
-                                    # Check whether the current log object has backend timestamp; it may be None
-                                    # if the file had been rotated during previous iteration while the current data
-                                    # item resided in data queue. So if the file had been rotated we need to restore
-                                    # backend timestamp. The same logic is for the first timestamp in the log (the
-                                    # one which is parsed from log messages.
-                                    first_log_timestamp = log_object['first_msg_ts']
-                                    if first_log_timestamp is None:
-                                        log_object['first_msg_ts'] = new_timestamp
-
-                                    need_rotate = AmazonS3ArchivingBackend.check_rotation_needed(log_object,
-                                                                                                 new_data_chunk_size,
-                                                                                                 new_timestamp)
-                                    if need_rotate:
-                                        log.info('Rotation for %s; current data size = %d; first timestamp '
-                                                 'in the file is %d' %
-                                                 (log_name, log_object['size'], log_object['first_msg_ts']))
-                                        self.archiving_backend.rotate_log(log_object, log_name)
-
-                            self.archiving_backend.flush_data_to_local_log_file(item['log_name'], item['data'])
-
-                        except Exception, e:
-                            if hasattr(e, 'strerror'):
-                                message = e.strerror
-                            else:
-                                message = e.message
-                            log.error('Error: cannot write data to ' +
-                                      self.archiving_backend.logs_map[item['log_name']]['local_log_file'] +
-                                      '. Error: ' + message)
-                except IndexError:
-                    pass
-                except Exception:
-                    pass
+                        if need_rotate:
+                            if chunks:
+                                self.write_chunks(log_name, chunks)
+                                chunks = []
+                                chunks_size = 0
+                            log.info('Rotation for %s; current data size = %d; first timestamp '
+                                     'in the file is %d' %
+                                     (log_name, log_object['size'], log_object['first_msg_ts']))
+                            try:
+                                self.archiving_backend.rotate_log(log_object, log_name)
+                            except Exception, e:
+                                # The data is kept in the current file, rotation is retried with the next item
+                                log.error('Error: cannot rotate %s. Error: %s' % (log_object['local_log_file'], e))
+                            if log_object['first_msg_ts'] is None:
+                                log_object['first_msg_ts'] = new_timestamp
+
+                chunks.append(item['data'])
+                chunks_size += item['size']
+
+            if chunks:
+                self.write_chunks(log_name, chunks)
 
         def stop(self):
             self.need_to_stop.set()
-
-    # Local log file open modes: True - the file exists - mode 'ab' (Append Binary); False - the
-    # file does not exist - mode 'wb+' (Write-Truncate Binary)
-    local_log_file_open_modes = {True: 'ab', False: 'wb+'}
+            self.data_queue.wakeup()
 
     def __init__(self, no_logs_rotation=False,  # This switch is used by several unit tests in local_backend_test.py
                  no_timestamps=False,  # This switch is used by several unit tests in local_backend_test.py
@@ -122,18 +230,7 @@ class AmazonS3ArchivingBackend:
                  die_on_errors=True):
         self.is_enabled = False
 
-        if not avail_features["deque_k-v_params_2.7"]:
-            class dequeCompat(collections.deque):
-                def __init__(self, iterable=(), maxlen=None):
-                    super(collections.deque, self).__init__(iterable, maxlen)
-                    self._maxlen = maxlen
-
-                @property
-                def maxlen(self):
-                    return self._maxlen
-            self.data_queue = dequeCompat((), ARCHIVING_BACKEND_MAX_DATA_QUEUE_LENGTH)
-        else:
-            self.data_queue = collections.deque(maxlen=ARCHIVING_BACKEND_MAX_DATA_QUEUE_LENGTH)
+        self.data_queue = DataQueue(ARCHIVING_BACKEND_MAX_DATA_QUEUE_LENGTH)
 
         self.logs_map = {}
 
@@ -180,7 +277,9 @@ class AmazonS3ArchivingBackend:
         self._enumerate_existing_logs(ARCHIVING_BACKEND_BASE_DIRECTORY, self.compress_callback)
 
     def shutdown(self):
+        # The worker closes local log files when it stops
         self.data_queue_thread.stop()
+        self.data_queue_thread.join(DATA_QUEUE_STOP_TIMEOUT)
         self.logs_compressor.stop()
         self.s3_sender.stop()
 
@@ -329,6 +428,8 @@ class AmazonS3ArchivingBackend:
         try:
             try:
                 self.log_map_lock.acquire()
+                # The file is reopened with the next written data
+                self.close_local_log_file(log_object)
                 os.rename(old_file_name, new_file_name)
 
                 log_object['size'] = 0  # Size of written data is cleared due to the file rotation.
@@ -396,7 +497,10 @@ class AmazonS3ArchivingBackend:
             'token': token,  # Log's token
             'size': size,  # Amount of data written to the log file in bytes
             # First timestamp got from the first message; used for checking rotation conditions.
-            'first_msg_ts': first_msg_ts}
+            'first_msg_ts': first_msg_ts,
+            'fd': None,  # Open handle of the log file, None until data is written to it
+            'unflushed': 0,  # Amount of data buffered in the handle in bytes
+            'flushed_at': 0}  # Time the handle was last flushed
         self.logs_map[log_name] = new_object
         return new_object
 
@@ -421,13 +525,28 @@ class AmazonS3ArchivingBackend:
         :param log_name - str - name of the log file without the path to it (to reference it in the logs map):
         :param data - str - data to be pushed to the data queue:
 
+        :return:
+        """
+        if data is None:
+            return
+        self.put_lines_to_local_log(log_name, token, '', [data])
+
+    def put_lines_to_local_log(self, log_name, token, prefix, lines):
+        """
+        The same as put_data_to_local_log, but pushes a list of lines as one data item. Each line is prepended with
+        the timestamp (unless disabled) and the prefix; the item is built with a single join.
+
+        :param log_name - str - name of the log file without the path to it (to reference it in the logs map):
+        :param prefix - str - string to be prepended to each line:
+        :param lines - list - lines to be pushed to the data queue:
+
         :return:
         """
         try:
             try:
                 self.log_map_lock.acquire()
 
-                if data is None:
+                if not lines:
                     return
 
                 timestamp = TimeUtils.get_current_time_as_timestamp_as_ms()
@@ -442,19 +561,15 @@ class AmazonS3ArchivingBackend:
                 self.log_map_lock.release()
 
             if not self.no_timestamps:
-                data = str(timestamp) + ' ' + data
+                prefix = str(timestamp) + ' ' + prefix
 
+            data = prefix + prefix.join(lines)
             data_size = len(data)
 
             new_data_item = {'log_name': log_name, 'token': token, 'data': data, 'size': data_size,
                              'timestamp': timestamp}
 
-            while len(self.data_queue) == self.data_queue.maxlen:
-                time.sleep(DATA_QUEUE_FREE_WAIT_PERIOD)
-
-            self.data_queue.appendleft(new_data_item)
-
-            self.data_queue_thread.data_consumer_event.set()
+            self.data_queue.put(new_data_item)
         except threading.ThreadError, e:
             log.error('Cannot acquire log write lock! Error %s' % e.message)
             raise
@@ -479,14 +594,70 @@ class AmazonS3ArchivingBackend:
 
         log_object = self.logs_map.get(log_name)
         log_object['size'] += len(data)
-        local_file = AmazonS3ArchivingBackend.check_local_log_exists(log_object['local_log_file'])
-        fd = None
-        try:
-            fd = open(local_file['path'], AmazonS3ArchivingBackend.local_log_file_open_modes[local_file['exists']])
-            fd.write(data)
-        finally:
-            if fd is not None:
-                fd.close()
+        if log_object['fd'] is None:
+            log_object['fd'] = open(log_object['local_log_file'], 'ab', LOCAL_LOG_BUFFER_SIZE)
+            log_object['flushed_at'] = time.time()
+        log_object['fd'].write(data)
+        log_object['unflushed'] += len(data)
+        if log_object['unflushed'] >= LOCAL_LOG_BUFFER_SIZE:
+            self.flush_local_log_file(log_object)
+
+    @staticmethod
+    def flush_local_log_file(log_object):
+        """
+        Flushes data buffered in the handle of the given log object to disk.
+
+        :param log_object - dict - log object from logs_map:
+
+        :return:
+        """
+        if log_object['fd'] is not None and log_object['unflushed']:
+            log_object['fd'].flush()
+        log_object['unflushed'] = 0
+        log_object['flushed_at'] = time.time()
+
+    def flush_local_log_files(self, flushed_before=None):
+        """
+        Flushes handles of all local logs, or only of those which were last flushed before the given time.
+
+        :param flushed_before - float - if given, only handles last flushed before this time are flushed:
+
+        :return:
+        """
+        for log_name, log_object in self.logs_map.items():
+            if flushed_before is not None and log_object['flushed_at'] > flushed_before:
+                continue
+            try:
+                self.flush_local_log_file(log_object)
+            except IOError, e:
+                log.error('Error: cannot write data to %s. Error: %s' % (log_object['local_log_file'], e.strerror))
+
+    @staticmethod
+    def close_local_log_file(log_object):
+        """
+        Flushes and closes the handle of the given log object. The file is opened again when new data is written.
+
+        :param log_object - dict - log object from logs_map:
+
+        :return:
+        """
+        fd = log_object['fd']
+        log_object['fd'] = None
+        log_object['unflushed'] = 0
+        if fd is not None:
+            fd.close()
+
+    def close_local_log_files(self):
+        """
+        Flushes and closes handles of all local logs.
+
+        :return:
+        """
+        for log_name, log_object in self.logs_map.items():
+            try:
+                self.close_local_log_file(log_object)
+            except IOError, e:
+                log.error('Error: cannot write data to %s. Error: %s' % (log_object['local_log_file'], e.strerror))
 
     def _enumerate_existing_logs(self, logs_base_dir, callback=None):
         """
@@ -0,0 +1,101 @@
+# coding: utf-8
+# vim: set ts=4 sw=4 et:
+
+"""
+Timer loop shared by periodic tasks.
+
+threading.Timer starts a new thread for every run of a task. The scheduler
+runs all timers from one thread instead, in the order of their deadlines.
+Callbacks run on the scheduler thread and should not block.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+import traceback
+
+__author__ = 'Logentries'
+
+__all__ = ['Scheduler']
+
+LOG_LE_AGENT = 'logentries.com'
+log = logging.getLogger(LOG_LE_AGENT)
+
+
+class _Timer(object):
+    """Handle of a scheduled call, compatible with threading.Timer.cancel."""
+
+    def __init__(self, callback, args):
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler(object):
+    """Runs callbacks at given times from a single thread."""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._timers = []  # Heap of (deadline, sequence, timer)
+        self._sequence = itertools.count()
+        self._shutdown = False
+        self._thread = threading.Thread(target=self.run, name='scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def call_later(self, delay, callback, args=()):
+        """Calls the callback with args after delay seconds. Returns a handle
+        which can cancel the call."""
+        timer = _Timer(callback, args)
+        self._cond.acquire()
+        try:
+            heapq.heappush(self._timers, (time.time() + delay, self._sequence.next(), timer))
+            self._cond.notify()
+        finally:
+            self._cond.release()
+        return timer
+
+    def _next(self):
+        """Waits for the earliest timer and returns it, None on shutdown."""
+        self._cond.acquire()
+        try:
+            while not self._shutdown:
+                if not self._timers:
+                    self._cond.wait()
+                    continue
+                deadline, _, timer = self._timers[0]
+                if timer.cancelled:
+                    heapq.heappop(self._timers)
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    heapq.heappop(self._timers)
+                    return timer
+                self._cond.wait(remaining)
+            return None
+        finally:
+            self._cond.release()
+
+    def run(self):
+        while True:
+            timer = self._next()
+            if not timer:
+                break
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                log.error("Exception in scheduler: %s", traceback.format_exc())
+
+    def close(self):
+        self._cond.acquire()
+        try:
+            self._shutdown = True
+            self._cond.notify()
+        finally:
+            self._cond.release()
+        self._thread.join(1.0)
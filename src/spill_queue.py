@@ -0,0 +1,304 @@
+# coding: utf-8
+# vim: set ts=4 sw=4 et:
+
+"""
+Disk-backed overflow of the send queue.
+
+Entries which do not fit into the in-memory send queue are appended to
+segment files in a directory and read back in the same order once the
+connection catches up. Segments are written sequentially and synced to disk
+by a timer, so that threads putting entries never wait for the disk. A fully
+read segment is deleted. If the total size of segments
+exceeds the limit, the oldest segment is dropped.
+
+Each segment contains records of a 4-byte big-endian length followed by the
+entry. Segments left over from a previous run are sent first; the read
+position is saved on close so that entries are not sent twice.
+"""
+
+import errno
+import logging
+import os
+import struct
+import threading
+
+__author__ = 'Logentries'
+
+__all__ = ['SpillQueue']
+
+LOG_LE_AGENT = 'logentries.com'
+log = logging.getLogger(LOG_LE_AGENT)
+
+# Header of a record, the length of the entry
+RECORD_HEADER = struct.Struct('>I')
+
+# Name of the file with the read position, written on close
+CURSOR_NAME = 'cursor'
+
+# Suffix of segment files, the name is the hexadecimal sequence number
+SEGMENT_SUFFIX = '.seg'
+
+# Sequence number of the first segment, leaves room for segments written in
+# front of existing ones
+FIRST_SEQUENCE = 1 << 32
+
+
+class SpillQueue(object):
+    """FIFO queue of entries stored in segment files. Safe to be used from
+    multiple threads."""
+
+    def __init__(self, directory, max_size, segment_size, sync_interval, scheduler=None):
+        self._directory = directory
+        self._max_size = max_size
+        self._segment_size = segment_size
+        self._sync_interval = sync_interval
+        self._scheduler = scheduler
+        self._lock = threading.Lock()
+        self._segments = []  # Sequence numbers of segments, oldest first
+        self._size = 0  # Total size of segments
+        self._write_fd = None
+        self._write_size = 0
+        self._synced = True
+        self._unsynced_fds = []  # Descriptors of written segments to sync and close
+        self._shutdown = False
+        self._timer = None
+        self._read_file = None
+        self._read_offset = 0
+        self._skip = {}  # Sequence number -> offset read in a previous run
+        self._dropped = 0
+        self._load()
+        self._schedule()
+
+    def _schedule(self):
+        if self._shutdown:
+            return
+        if self._scheduler:
+            self._timer = self._scheduler.call_later(self._sync_interval, self._sync_periodically)
+        else:
+            self._timer = threading.Timer(self._sync_interval, self._sync_periodically, ())
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _sync_periodically(self):
+        try:
+            self.sync()
+        except OSError, e:
+            log.warning("Cannot sync %s: %s", self._directory, e.strerror)
+        self._schedule()
+
+    def _path(self, seq):
+        return os.path.join(self._directory, '%016x%s' % (seq, SEGMENT_SUFFIX))
+
+    def _load(self):
+        """Picks up segments left over from a previous run."""
+        try:
+            os.makedirs(self._directory, 0700)
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+        for name in os.listdir(self._directory):
+            if name.endswith(SEGMENT_SUFFIX):
+                try:
+                    seq = int(name[:-len(SEGMENT_SUFFIX)], 16)
+                except ValueError:
+                    continue
+                self._segments.append(seq)
+                self._size += os.path.getsize(os.path.join(self._directory, name))
+        self._segments.sort()
+
+        cursor = os.path.join(self._directory, CURSOR_NAME)
+        try:
+            f = open(cursor)
+            try:
+                for line in f:
+                    seq, offset = [int(x) for x in line.split()]
+                    self._skip[seq] = offset
+            finally:
+                f.close()
+            os.remove(cursor)
+        except (IOError, OSError, ValueError):
+            pass
+        if self._segments:
+            log.info("Sending %d bytes spilled to %s", self._size, self._directory)
+
+    def _open_segment(self, seq):
+        self._close_segment()
+        self._write_fd = os.open(self._path(seq), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0600)
+        self._write_size = 0
+
+    def _close_segment(self):
+        """Closes the segment being written, it is synced by the timer."""
+        if self._write_fd is not None:
+            if self._synced:
+                os.close(self._write_fd)
+            else:
+                self._unsynced_fds.append(self._write_fd)
+            self._write_fd = None
+            self._synced = True
+
+    def sync(self):
+        """Syncs written entries to disk. The lock is not held while
+        syncing, the segment being written is synced through a duplicate
+        descriptor."""
+        self._lock.acquire()
+        try:
+            fds = self._unsynced_fds
+            self._unsynced_fds = []
+            if self._write_fd is not None and not self._synced:
+                fds.append(os.dup(self._write_fd))
+                self._synced = True
+        finally:
+            self._lock.release()
+        for fd in fds:
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _write(self, fd, entry):
+        data = RECORD_HEADER.pack(len(entry)) + entry
+        while data:
+            data = data[os.write(fd, data):]
+
+    def _remove_oldest(self):
+        seq = self._segments.pop(0)
+        if self._read_file:
+            self._read_file.close()
+            self._read_file = None
+        self._read_offset = 0
+        self._skip.pop(seq, None)
+        path = self._path(seq)
+        try:
+            self._size -= os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _drop_oldest(self):
+        """Removes the oldest segment to make room for new entries."""
+        self._remove_oldest()
+        if not self._dropped:
+            log.warning("Spill queue %s is full, dropping oldest entries", self._directory)
+        self._dropped += 1
+
+    def put(self, entry):
+        """Appends the entry to the queue."""
+        self._lock.acquire()
+        try:
+            if self._write_fd is None or self._write_size + len(entry) > self._segment_size:
+                # Segments of a previous run are never appended to, their
+                # last record may be incomplete
+                if self._segments:
+                    seq = self._segments[-1] + 1
+                else:
+                    seq = FIRST_SEQUENCE
+                self._open_segment(seq)
+                self._segments.append(seq)
+            self._write(self._write_fd, entry)
+            self._write_size += RECORD_HEADER.size + len(entry)
+            self._size += RECORD_HEADER.size + len(entry)
+            self._synced = False
+            while self._size > self._max_size and len(self._segments) > 1:
+                self._drop_oldest()
+        finally:
+            self._lock.release()
+
+    def put_front(self, entries):
+        """Stores entries in front of all others, used to save entries which
+        were queued in memory when closing."""
+        if not entries:
+            return
+        self._lock.acquire()
+        try:
+            if self._segments:
+                seq = self._segments[0] - 1
+            else:
+                seq = FIRST_SEQUENCE
+            fd = os.open(self._path(seq), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+            try:
+                for entry in entries:
+                    self._write(fd, entry)
+                    self._size += RECORD_HEADER.size + len(entry)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            if self._read_file:
+                # Continue in the current first segment after the new one
+                self._skip[self._segments[0]] = self._read_offset
+                self._read_file.close()
+                self._read_file = None
+            self._read_offset = 0
+            self._segments.insert(0, seq)
+        finally:
+            self._lock.release()
+
+    def get(self):
+        """Returns the oldest entry or None if the queue is empty."""
+        self._lock.acquire()
+        try:
+            while self._segments:
+                seq = self._segments[0]
+                writing = self._write_fd is not None and seq == self._segments[-1]
+                if writing and self._read_offset >= self._write_size:
+                    return None
+                if not self._read_file:
+                    self._read_file = open(self._path(seq), 'rb')
+                    self._read_offset = self._skip.pop(seq, 0)
+                    self._read_file.seek(self._read_offset)
+                header = self._read_file.read(RECORD_HEADER.size)
+                if len(header) == RECORD_HEADER.size:
+                    length = RECORD_HEADER.unpack(header)[0]
+                    entry = self._read_file.read(length)
+                    if len(entry) == length:
+                        self._read_offset += RECORD_HEADER.size + length
+                        return entry
+                if writing:
+                    return None
+                # End of the segment or an incomplete record after a crash
+                self._remove_oldest()
+            return None
+        finally:
+            self._lock.release()
+
+    def _empty(self):
+        if not self._segments:
+            return True
+        return (len(self._segments) == 1 and self._write_fd is not None and
+                self._read_offset >= self._write_size)
+
+    def empty(self):
+        """Returns True if there are no entries to read."""
+        self._lock.acquire()
+        try:
+            return self._empty()
+        finally:
+            self._lock.release()
+
+    def close(self):
+        """Syncs written entries and saves the read position."""
+        self._shutdown = True
+        t = self._timer
+        if t:
+            t.cancel()
+        self._lock.acquire()
+        try:
+            drained = self._empty()
+            self._close_segment()
+            if drained and self._segments:
+                self._remove_oldest()
+            if self._read_file:
+                self._skip[self._segments[0]] = self._read_offset
+                self._read_file.close()
+                self._read_file = None
+            if self._skip:
+                f = open(os.path.join(self._directory, CURSOR_NAME), 'w')
+                try:
+                    for seq, offset in self._skip.iteritems():
+                        f.write('%d %d\n' % (seq, offset))
+                finally:
+                    f.close()
+            if self._dropped:
+                log.warning("Dropped %d spilled segments of %s", self._dropped, self._directory)
+        finally:
+            self._lock.release()
+        self.sync()
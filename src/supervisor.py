@@ -0,0 +1,291 @@
+# coding: utf-8
+# vim: set ts=4 sw=4 et:
+
+"""
+Supervisor of worker processes.
+
+Followed logs are split between worker processes so that the agent is not
+limited to one core. The supervisor forks the workers, restarts them when
+they exit or stop sending heartbeats, and stops them all on shutdown.
+
+Each worker writes a byte to its heartbeat pipe every few seconds from a
+separate thread, but only while its loops make progress: every loop
+registered with Progress is asked to run a callback, and a loop which has
+not run the previous one stops the heartbeats. A worker which has not
+written for the heartbeat timeout, because it is hung or deadlocked, is
+killed and started again. A worker whose supervisor has gone away
+terminates itself.
+"""
+
+import errno
+import fcntl
+import functools
+import logging
+import os
+import select
+import signal
+import threading
+import time
+import traceback
+
+__author__ = 'Logentries'
+
+__all__ = ['Supervisor', 'Progress']
+
+LOG_LE_AGENT = 'logentries.com'
+log = logging.getLogger(LOG_LE_AGENT)
+
+# Time between heartbeats of a worker
+HEARTBEAT_INTERVAL = 5  # Seconds
+
+# Delay before a worker is restarted, doubled on each failure up to the max
+RESTART_DELAY_MIN = 1  # Seconds
+RESTART_DELAY_MAX = 60  # Seconds
+
+# A worker running for this long is considered healthy, its delay is reset
+RESTART_RESET = 60  # Seconds
+
+# Time workers have to shut down before they are killed
+SHUTDOWN_TIMEOUT = 5  # Seconds
+
+
+def _terminate(signum, frame):
+    """Shuts a worker down the same way as Ctrl+C."""
+    raise KeyboardInterrupt()
+
+
+class Progress(object):
+    """Progress of the loops of a worker process. Each registered loop is
+    probed with probe(tick), which has to arrange for tick() to be called
+    from the loop."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loops = {}  # name -> [probe, answered]
+
+    def register(self, name, probe):
+        self._lock.acquire()
+        try:
+            self._loops[name] = [probe, True]
+        finally:
+            self._lock.release()
+
+    def _tick(self, name):
+        self._lock.acquire()
+        try:
+            self._loops[name][1] = True
+        finally:
+            self._lock.release()
+
+    def check(self):
+        """Returns names of loops which have not answered the last probe
+        and probes the others again."""
+        stalled = []
+        probes = []
+        self._lock.acquire()
+        try:
+            for name, loop in self._loops.iteritems():
+                if loop[1]:
+                    loop[1] = False
+                    probes.append((name, loop[0]))
+                else:
+                    stalled.append(name)
+        finally:
+            self._lock.release()
+        for name, probe in probes:
+            try:
+                probe(functools.partial(self._tick, name))
+            except Exception:
+                log.error("Cannot probe %s: %s", name, traceback.format_exc())
+        return sorted(stalled)
+
+
+class _Worker(object):
+    """State of a worker process as seen by the supervisor."""
+
+    def __init__(self, index):
+        self.index = index
+        self.pid = None
+        self.pipe = None
+        self.started = 0
+        self.last_beat = 0
+        self.delay = RESTART_DELAY_MIN
+        self.restart_at = 0
+
+
+class Supervisor(object):
+    """Runs target(index) in each of the worker processes. Heartbeats of a
+    worker depend on the loops the target registers with progress."""
+
+    def __init__(self, workers, target, heartbeat_timeout, progress=None):
+        self._target = target
+        self._heartbeat_timeout = heartbeat_timeout
+        self._progress = progress
+        self._workers = [_Worker(i) for i in range(workers)]
+        self._shutdown = False
+
+    def _heartbeat(self, fd):
+        """Runs in the worker process."""
+        reported = []
+        while True:
+            stalled = []
+            if self._progress:
+                stalled = self._progress.check()
+            if stalled:
+                if stalled != reported:
+                    log.warning("Worker %d is not making progress in %s, heartbeats stopped",
+                                os.getpid(), ', '.join(stalled))
+            else:
+                try:
+                    os.write(fd, '.')
+                except OSError:
+                    # The supervisor is gone
+                    log.warning("Supervisor exited, shutting down worker %d", os.getpid())
+                    os.kill(os.getpid(), signal.SIGTERM)
+                    return
+            reported = stalled
+            time.sleep(HEARTBEAT_INTERVAL)
+
+    def _run_worker(self, worker, fd):
+        """Runs in the worker process, never returns."""
+        status = 0
+        try:
+            signal.signal(signal.SIGTERM, _terminate)
+            signal.signal(signal.SIGINT, _terminate)
+            t = threading.Thread(target=self._heartbeat, args=(fd,), name='heartbeat')
+            t.daemon = True
+            t.start()
+            self._target(worker.index)
+        except KeyboardInterrupt:
+            pass
+        except SystemExit, e:
+            if isinstance(e.code, int):
+                status = e.code
+            else:
+                status = 1
+        except Exception:
+            log.error("Exception in worker %d: %s", worker.index, traceback.format_exc())
+            status = 1
+        os._exit(status)
+
+    def _start(self, worker):
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            for other in self._workers:
+                if other.pipe is not None:
+                    os.close(other.pipe)
+            self._run_worker(worker, w)
+        os.close(w)
+        fcntl.fcntl(r, fcntl.F_SETFL, fcntl.fcntl(r, fcntl.F_GETFL) | os.O_NONBLOCK)
+        worker.pid = pid
+        worker.pipe = r
+        worker.started = worker.last_beat = time.time()
+        log.info("Started worker %d, pid %d", worker.index, pid)
+
+    def _close_pipe(self, worker):
+        if worker.pipe is not None:
+            os.close(worker.pipe)
+            worker.pipe = None
+
+    def _read_heartbeats(self, timeout):
+        pipes = dict((x.pipe, x) for x in self._workers if x.pipe is not None)
+        try:
+            ready = select.select(pipes.keys(), [], [], timeout)[0]
+        except select.error, e:
+            if e.args[0] != errno.EINTR:
+                raise
+            return
+        now = time.time()
+        for fd in ready:
+            worker = pipes[fd]
+            try:
+                if os.read(fd, 4096):
+                    worker.last_beat = now
+                else:
+                    # The worker has exited, it is reaped below
+                    self._close_pipe(worker)
+            except OSError, e:
+                if e.errno != errno.EAGAIN:
+                    self._close_pipe(worker)
+
+    def _reap(self):
+        now = time.time()
+        for worker in self._workers:
+            if worker.pid is None:
+                continue
+            try:
+                pid, status = os.waitpid(worker.pid, os.WNOHANG)
+            except OSError, e:
+                if e.errno != errno.ECHILD:
+                    raise
+                pid, status = worker.pid, 0
+            if pid:
+                self._exited(worker, status, now)
+            elif now - worker.last_beat > self._heartbeat_timeout:
+                log.warning("Worker %d, pid %d, is not responding, killing it", worker.index, worker.pid)
+                try:
+                    os.kill(worker.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+                # Do not kill it again before it is reaped
+                worker.last_beat = now
+
+    def _exited(self, worker, status, now):
+        self._close_pipe(worker)
+        worker.pid = None
+        if self._shutdown:
+            return
+        if now - worker.started > RESTART_RESET:
+            worker.delay = RESTART_DELAY_MIN
+        if os.WIFSIGNALED(status):
+            reason = "was killed by signal %d" % os.WTERMSIG(status)
+        else:
+            reason = "exited with status %d" % os.WEXITSTATUS(status)
+        log.warning("Worker %d %s, restarting in %ds", worker.index, reason, worker.delay)
+        worker.restart_at = now + worker.delay
+        worker.delay = min(worker.delay * 2, RESTART_DELAY_MAX)
+
+    def _stop(self, signum, frame):
+        self._shutdown = True
+
+    def run(self):
+        """Starts workers and supervises them until SIGTERM or SIGINT."""
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for worker in self._workers:
+            self._start(worker)
+
+        while not self._shutdown:
+            self._read_heartbeats(1)
+            self._reap()
+            now = time.time()
+            for worker in self._workers:
+                if worker.pid is None and not self._shutdown and now >= worker.restart_at:
+                    self._start(worker)
+        self.shutdown()
+
+    def shutdown(self):
+        """Asks workers to shut down and kills those which do not."""
+        self._shutdown = True
+        for worker in self._workers:
+            if worker.pid is not None:
+                try:
+                    os.kill(worker.pid, signal.SIGTERM)
+                except OSError:
+                    pass
+        deadline = time.time() + SHUTDOWN_TIMEOUT
+        killed = False
+        while [x for x in self._workers if x.pid is not None]:
+            if not killed and time.time() >= deadline:
+                for worker in self._workers:
+                    if worker.pid is not None:
+                        log.warning("Worker %d did not shut down, killing it", worker.index)
+                        try:
+                            os.kill(worker.pid, signal.SIGKILL)
+                        except OSError:
+                            pass
+                killed = True
+            time.sleep(0.1)
+            self._reap()
@@ -0,0 +1,214 @@
+# coding: utf-8
+# vim: set ts=4 sw=4 et:
+
+"""
+Tail engine drives many followers from a small fixed pool of threads instead
+of running a thread per follower.
+
+Followers driven by the engine implement two methods:
+    service(events) reads and sends available data without blocking, events
+        is a mask of inotify events received for the follower (0 for timer).
+        Returns True if there may be more data to read.
+    release() closes the followed file. It is called from the worker thread
+        after the follower is removed from the engine.
+"""
+
+import logging
+import threading
+import time
+import traceback
+
+__author__ = 'Logentries'
+
+__all__ = ['TailEngine']
+
+LOG_LE_AGENT = 'logentries.com'
+log = logging.getLogger(LOG_LE_AGENT)
+
+
+class _Listener(object):
+    """Receives file notifications for a single follower and hands them over
+    to the worker servicing the follower."""
+
+    def __init__(self, worker, follower):
+        self._worker = worker
+        self._follower = follower
+
+    def notify(self, mask):
+        self._worker.notify(self._follower, mask)
+
+
+class _Worker(object):
+    """Thread servicing a subset of followers."""
+
+    def __init__(self, index, notifier, poll_interval):
+        self._notifier = notifier
+        self._poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._followers = set()
+        self._released = []
+        self._calls = []
+        self._pending = {}  # follower -> events mask
+        self._shutdown = False
+        self.assigned = 0
+
+        self._thread = threading.Thread(target=self.run, name='tail-engine-%d' % index)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def add(self, follower):
+        self._lock.acquire()
+        try:
+            self._followers.add(follower)
+            self._pending[follower] = 0
+        finally:
+            self._lock.release()
+        self._event.set()
+
+    def remove(self, follower):
+        self._lock.acquire()
+        try:
+            if follower in self._followers:
+                self._followers.discard(follower)
+                self._pending.pop(follower, None)
+                self._released.append(follower)
+        finally:
+            self._lock.release()
+        self._event.set()
+
+    def notify(self, follower, mask):
+        self._lock.acquire()
+        try:
+            if follower in self._followers:
+                self._pending[follower] = self._pending.get(follower, 0) | mask
+        finally:
+            self._lock.release()
+        self._event.set()
+
+    def _next_round(self, busy):
+        """Waits for work and returns a dictionary of followers to service
+        with their events."""
+        if not busy:
+            if self._notifier:
+                self._event.wait()
+            else:
+                time.sleep(self._poll_interval)
+        self._event.clear()
+
+        self._lock.acquire()
+        try:
+            released = self._released
+            self._released = []
+            calls = self._calls
+            self._calls = []
+            if self._notifier:
+                ready = self._pending
+                self._pending = {}
+            else:
+                ready = dict.fromkeys(self._followers, 0)
+            # Followers with data left from the last round are serviced anyway
+            for follower in busy:
+                if follower in self._followers:
+                    ready.setdefault(follower, 0)
+        finally:
+            self._lock.release()
+
+        for follower in released:
+            self._release(follower)
+        for callback in calls:
+            try:
+                callback()
+            except Exception:
+                log.error("Exception in tail engine: %s", traceback.format_exc())
+        return ready
+
+    def call_soon(self, callback):
+        """Calls the callback from the worker thread before the next round."""
+        self._lock.acquire()
+        try:
+            self._calls.append(callback)
+        finally:
+            self._lock.release()
+        self._event.set()
+
+    def _release(self, follower):
+        try:
+            follower.release()
+        except Exception:
+            log.error("Exception in tail engine: %s", traceback.format_exc())
+
+    def run(self):
+        busy = []
+        while not self._shutdown:
+            ready = self._next_round(busy)
+            busy = []
+            for follower, events in ready.items():
+                try:
+                    if follower.service(events):
+                        busy.append(follower)
+                except Exception:
+                    log.error("Exception in tail engine: %s", traceback.format_exc())
+
+        for follower in list(self._followers) + self._released:
+            self._release(follower)
+
+    def close(self):
+        self._shutdown = True
+        self._event.set()
+        self._thread.join(1.0)
+
+
+class TailEngine(object):
+    """Multiplexes followers over a fixed number of worker threads. When the
+    file notifier is given, followers are serviced when their files change,
+    otherwise all followers are polled in regular intervals."""
+
+    def __init__(self, workers, notifier, poll_interval):
+        self._notifier = notifier
+        self._workers = [_Worker(i, notifier, poll_interval) for i in range(max(workers, 1))]
+        self._assignment = {}  # follower -> worker
+        self._lock = threading.Lock()
+
+    def _assign(self, follower):
+        """Returns the worker for the follower, the least loaded worker is
+        selected for new followers."""
+        self._lock.acquire()
+        try:
+            worker = self._assignment.get(follower)
+            if not worker:
+                worker = min(self._workers, key=lambda x: x.assigned)
+                worker.assigned += 1
+                self._assignment[follower] = worker
+            return worker
+        finally:
+            self._lock.release()
+
+    def listener(self, follower):
+        """Returns the listener which should be registered with the file
+        notifier for the follower's files."""
+        return _Listener(self._assign(follower), follower)
+
+    def add(self, follower):
+        """Starts servicing the follower."""
+        self._assign(follower).add(follower)
+
+    def remove(self, follower):
+        """Stops servicing the follower, its file is released by the worker."""
+        self._lock.acquire()
+        try:
+            worker = self._assignment.pop(follower, None)
+            if worker:
+                worker.assigned -= 1
+        finally:
+            self._lock.release()
+        if worker:
+            worker.remove(follower)
+
+    def call_soon(self, index, callback):
+        """Calls the callback from the worker thread with the index."""
+        self._workers[index].call_soon(callback)
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
@@ -3,18 +3,53 @@
 #
 # Logentries data server mock
 #
+# Accepts plain and zlib compressed streams (--compress). A compressed
+# stream is recognized by the zlib header in its first byte. The size of
+# received and decompressed data is reported when a connection closes.
+# Run with -v to print the received entries.
+#
+
+import sys
+import zlib
 
 from twisted.internet import protocol, reactor, endpoints
 
+# First byte of a zlib stream with the default window size
+ZLIB_HEADER = '\x78'
+
 class Listen( protocol.Protocol):
+	def connectionMade( self):
+		self.decompressor = None
+		self.started = False
+		self.received = 0
+		self.decompressed = 0
+
 	def dataReceived( self, data):
-		pass
+		if not self.started:
+			self.started = True
+			if data[:1] == ZLIB_HEADER:
+				self.decompressor = zlib.decompressobj()
+		self.received += len( data)
+		if self.decompressor:
+			data = self.decompressor.decompress( data)
+		self.decompressed += len( data)
+		if self.factory.verbose:
+			sys.stdout.write( data)
+			sys.stdout.flush()
+
+	def connectionLost( self, reason):
+		if self.decompressor:
+			print 'Connection closed: %d bytes received, %d bytes decompressed' % (self.received, self.decompressed)
+		else:
+			print 'Connection closed: %d bytes received' % self.received
+		sys.stdout.flush()
 
 class ListenFactory( protocol.Factory):
-	def buildProtocol( self, addr):
-		return Listen()
+	protocol = Listen
+
+	def __init__( self, verbose):
+		self.verbose = verbose
 
 if __name__ == "__main__":
-	endpoints.serverFromString( reactor, "tcp:10000").listen(ListenFactory())
+	endpoints.serverFromString( reactor, "tcp:10000").listen(ListenFactory( '-v' in sys.argv[1:]))
 	reactor.run()
-
@@ -0,0 +1,82 @@
+import unittest
+import gzip
+import os
+import shutil
+import tempfile
+import time
+from src.catch_up import rotated_siblings, unsent_siblings, read_blocks, read_siblings
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'app.log')
+        for name in ['app.log', 'app.log.1', 'app.log.10', 'app.log.2', 'app.log.3', 'app.log.old', 'other.log.1']:
+            open(os.path.join(self.directory, name), 'w').write(name + '\n')
+        for name in ['app.log.2.gz', 'app.log.4.gz']:
+            f = gzip.open(os.path.join(self.directory, name), 'wb')
+            f.write(name + '\n')
+            f.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_rotated_siblings(self):
+        print('CatchUp - test_rotated_siblings:')
+        siblings = [os.path.basename(x) for x in rotated_siblings(self.path)]
+        self.assertEqual(siblings, ['app.log.10', 'app.log.4.gz', 'app.log.3', 'app.log.2', 'app.log.1'])
+
+    def test_read_blocks(self):
+        print('CatchUp - test_read_blocks:')
+        path = os.path.join(self.directory, 'app.log.4.gz')
+        self.assertEqual(''.join(read_blocks(path, 4)), 'app.log.4.gz\n')
+        self.assertEqual(list(read_blocks(os.path.join(self.directory, 'none'), 4)), [])
+
+    def test_read_blocks_skip(self):
+        print('CatchUp - test_read_blocks_skip:')
+        path = os.path.join(self.directory, 'multi.gz')
+        for data in ['first\n', 'second\n']:
+            f = gzip.open(path, 'ab')
+            f.write(data)
+            f.close()
+        self.assertEqual(''.join(read_blocks(path, 3, 2)), 'rst\nsecond\n')
+        self.assertEqual(''.join(read_blocks(os.path.join(self.directory, 'app.log.3'), 3, 8)), '3\n')
+
+    def test_unsent_siblings(self):
+        print('CatchUp - test_unsent_siblings:')
+        st = os.stat(os.path.join(self.directory, 'app.log.2'))
+        siblings = unsent_siblings(self.path, (st.st_dev, st.st_ino, 5, time.time()))
+        self.assertEqual([(os.path.basename(x), y) for x, y in siblings], [('app.log.2', 5)])
+
+        old = time.time() - 3600
+        for name in ['app.log.10', 'app.log.4.gz', 'app.log.3']:
+            os.utime(os.path.join(self.directory, name), (old, old))
+        siblings = unsent_siblings(self.path, (0, 0, 5, old + 1))
+        self.assertEqual([(os.path.basename(x), y) for x, y in siblings], [('app.log.2', 5), ('app.log.1', 0)])
+
+    def test_read_siblings(self):
+        print('CatchUp - test_read_siblings:')
+        blocks = list(read_siblings(self.path, 65536))
+        self.assertEqual(blocks, ['app.log.10\n', '', 'app.log.4.gz\n', '', 'app.log.3\n', '',
+                                  'app.log.2\n', '', 'app.log.1\n', ''])
+
+    def test_read_siblings_done(self):
+        print('CatchUp - test_read_siblings_done:')
+        done = []
+        for buff in read_siblings(self.path, 4, None, lambda *args: done.append(args)):
+            if not buff:
+                self.assertEqual(len(done), 1)
+                del done[:]
+        sibling = os.path.join(self.directory, 'app.log.3')
+        st = os.stat(sibling)
+        blocks = read_siblings(self.path, 65536, (st.st_dev, st.st_ino, 2, st.st_mtime),
+                               lambda *args: done.append(args))
+        self.assertEqual(blocks.next(), 'p.log.3\n')
+        self.assertEqual(done, [])
+        self.assertEqual(blocks.next(), '')
+        self.assertEqual(done, [(st.st_dev, st.st_ino, st.st_mtime, len('app.log.3\n'))])
+
+
+if __name__ == '__main__':
+    unittest.main()
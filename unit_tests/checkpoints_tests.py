@@ -0,0 +1,67 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from src.checkpoints import CheckpointStore
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'checkpoints')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_offsets_survive_restart(self):
+        print('CheckpointStore - test_offsets_survive_restart:')
+        store = CheckpointStore(self.filename, 60)
+        store.update(1, 2, '/var/log/with space.log', 1234)
+        store.close()
+
+        store = CheckpointStore(self.filename, 60)
+        self.assertEqual(store.get(1, 2, '/var/log/with space.log'), 1234)
+        store.close()
+
+    def test_offset_requires_same_file(self):
+        print('CheckpointStore - test_offset_requires_same_file:')
+        store = CheckpointStore(self.filename, 60)
+        store.update(1, 2, '/var/log/syslog', 100)
+        self.assertEqual(store.get(1, 3, '/var/log/syslog'), None)
+        self.assertEqual(store.get(1, 2, '/var/log/messages'), None)
+        store.close()
+
+    def test_find_most_recently_updated(self):
+        print('CheckpointStore - test_find_most_recently_updated:')
+        store = CheckpointStore(self.filename, 60)
+        store.update(1, 2, '/var/log/syslog', 100)
+        store.update(1, 3, '/var/log/syslog', 200, time.time() - 3600)
+        self.assertEqual(store.find('/var/log/syslog')[:3], (1, 2, 100))
+        store.update(1, 3, '/var/log/syslog', 300, time.time() + 3600)
+        self.assertEqual(store.find('/var/log/syslog')[:3], (1, 3, 300))
+        store.close()
+
+    def test_flush_only_when_changed(self):
+        print('CheckpointStore - test_flush_only_when_changed:')
+        store = CheckpointStore(self.filename, 60)
+        store.flush()
+        self.assertFalse(os.path.exists(self.filename))
+        store.update(1, 2, '/var/log/syslog', 100)
+        store.flush()
+        self.assertTrue(os.path.exists(self.filename))
+        store.close()
+
+    def test_malformed_records_are_ignored(self):
+        print('CheckpointStore - test_malformed_records_are_ignored:')
+        f = open(self.filename, 'w')
+        f.write('garbage\n1 2 300 %f /var/log/syslog\n' % time.time())
+        f.close()
+        store = CheckpointStore(self.filename, 60)
+        self.assertEqual(store.get(1, 2, '/var/log/syslog'), 300)
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import threading
+import time
+from src.s3_archiving_backend import DataQueue
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def start(self, target, *args):
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def test_get_all_order(self):
+        print('DataQueue - test_get_all_order:')
+        q = DataQueue(10)
+        for x in range(5):
+            q.put(x)
+        self.assertEqual(len(q), 5)
+        self.assertEqual(q.get_all(0), [0, 1, 2, 3, 4])
+        self.assertEqual(len(q), 0)
+        q.put(5)
+        self.assertEqual(q.get_all(0), [5])
+
+    def test_get_all_timeout(self):
+        print('DataQueue - test_get_all_timeout:')
+        q = DataQueue(10)
+        started = time.time()
+        self.assertEqual(q.get_all(0.1), [])
+        self.assertTrue(time.time() - started >= 0.1)
+
+    def test_put_blocks_while_full(self):
+        print('DataQueue - test_put_blocks_while_full:')
+        q = DataQueue(2)
+        q.put(0)
+        q.put(1)
+        producer = self.start(q.put, 2)
+        producer.join(0.2)
+        self.assertTrue(producer.is_alive())
+        self.assertEqual(len(q), 2)
+        self.assertEqual(q.get_all(0), [0, 1])
+        producer.join(1)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(q.get_all(0), [2])
+
+    def test_put_wakes_consumer(self):
+        print('DataQueue - test_put_wakes_consumer:')
+        q = DataQueue(10)
+        result = []
+        consumer = self.start(lambda: result.extend(q.get_all(10)))
+        time.sleep(0.1)
+        q.put('item')
+        consumer.join(1)
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual(result, ['item'])
+
+    def test_wakeup(self):
+        print('DataQueue - test_wakeup:')
+        q = DataQueue(10)
+        result = []
+        consumer = self.start(lambda: result.append(q.get_all(10)))
+        time.sleep(0.1)
+        q.wakeup()
+        consumer.join(1)
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual(result, [[]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import re
+import json
+from src.formatters import FormatSyslog, FormatJSON
+
+SYSLOG_PATTERN = ('tok<14>1 [0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}\.[0-9]{3}Z '
+                  'host app - - - hostname=host appname=app line\n$')
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.formatter = FormatSyslog('host', 'app', 'tok')
+
+    def test_format_line(self):
+        print('FormatSyslog - test_format_line:')
+        self.assertTrue(re.match(SYSLOG_PATTERN, self.formatter.format_line('line\n')))
+
+    def test_format_lines(self):
+        print('FormatSyslog - test_format_lines:')
+        lines = self.formatter.format_lines(['line\n', 'line\n'])
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(re.match(SYSLOG_PATTERN, lines[0]))
+        self.assertEqual(lines[0], lines[1])
+
+    def test_format_block(self):
+        print('FormatSyslog - test_format_block:')
+        lines = ['first\n', 'second\n']
+        block = self.formatter.format_block(lines)
+        self.assertEqual(block, ''.join(self.formatter.format_lines(lines)))
+
+    def test_msgid_token(self):
+        print('FormatSyslog - test_msgid_token:')
+        line = self.formatter.format_line('line\n', msgid='cpu', token='other')
+        self.assertTrue(line.startswith('other<14>1 '))
+        self.assertTrue(line.endswith(' host app - cpu - hostname=host appname=app line\n'))
+
+    def test_datahub(self):
+        print('FormatSyslog - test_datahub:')
+        formatter = FormatSyslog('host', 'app', 'tok', send_datahub=True)
+        self.assertTrue(formatter.format_line('line\n').startswith('<14>1 '))
+
+
+class TestFormatJSON(unittest.TestCase):
+
+    def format(self, line, **kwargs):
+        formatter = FormatJSON('host', 'app', 'tok', **kwargs)
+        formatted = formatter.format_line(line)
+        self.assertTrue(formatted.startswith('tok {'))
+        self.assertTrue(formatted.endswith('}\n'))
+        return json.loads(formatted[4:])
+
+    def test_message(self):
+        print('FormatJSON - test_message:')
+        event = self.format('a=1 plain line\n')
+        self.assertEqual(event['message'], 'a=1 plain line')
+        self.assertEqual(event['hostname'], 'host')
+        self.assertEqual(event['appname'], 'app')
+        self.assertTrue('a' not in event)
+
+    def test_kv(self):
+        print('FormatJSON - test_kv:')
+        event = self.format('user=joe status=200 msg="not \\"found\\""\n', kv=True)
+        self.assertEqual(event['user'], 'joe')
+        self.assertEqual(event['status'], '200')
+        self.assertEqual(event['msg'], 'not "found"')
+
+    def test_pattern(self):
+        print('FormatJSON - test_pattern:')
+        pattern = re.compile(r'^(?P<level>[A-Z]+) (?P<code>\d+)?')
+        event = self.format('ERROR something\n', pattern=pattern, drop=['message'])
+        self.assertEqual(event['level'], 'ERROR')
+        self.assertTrue('code' not in event)
+        self.assertTrue('message' not in event)
+
+    def test_message_is_not_replaced(self):
+        print('FormatJSON - test_message_is_not_replaced:')
+        event = self.format('message=hidden hostname=web1 status=200\n', kv=True)
+        self.assertEqual(event['message'], 'message=hidden hostname=web1 status=200')
+        self.assertEqual(event['hostname'], 'web1')
+        self.assertEqual(event['status'], '200')
+        pattern = re.compile(r'^(?P<level>[A-Z]+) (?P<message>.*)')
+        event = self.format('ERROR disk full\n', pattern=pattern)
+        self.assertEqual(event['message'], 'ERROR disk full')
+        self.assertEqual(event['level'], 'ERROR')
+
+    def test_passthrough(self):
+        print('FormatJSON - test_passthrough:')
+        event = self.format('{"level": "info", "secret": 1}\n', drop=['secret'])
+        self.assertEqual(event['level'], 'info')
+        self.assertTrue('secret' not in event)
+        self.assertTrue('message' not in event)
+        event = self.format('{"level": "info"}\n', passthrough=False)
+        self.assertEqual(event['message'], '{"level": "info"}')
+
+    def test_datahub(self):
+        print('FormatJSON - test_datahub:')
+        formatter = FormatJSON('host', 'app', 'tok', send_datahub=True)
+        self.assertTrue(formatter.format_block(['a\n', 'b\n']).startswith('{'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import glob
+import os
+import shutil
+import tempfile
+import time
+from src import glob_index
+from src.glob_index import GlobIndex
+
+
+class FakeNotifier(object):
+
+    def __init__(self):
+        self.watches = {}
+        self.next_wd = 1
+
+    def subscribe(self, listener):
+        pass
+
+    def add(self, path, mask, listener):
+        wd = self.next_wd
+        self.next_wd += 1
+        self.watches[wd] = path
+        return wd
+
+    def remove(self, wd, listener):
+        del self.watches[wd]
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ['app', 'web']:
+            os.mkdir(os.path.join(self.directory, name))
+        for name in ['app/worker-1.log', 'app/worker-2.log', 'app/.hidden.log', 'web/access.log']:
+            open(os.path.join(self.directory, name), 'w').close()
+        self.index = GlobIndex()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_glob_matches_standard_glob(self):
+        print('GlobIndex - test_glob_matches_standard_glob:')
+        for pattern in ['app/*.log', '*/*.log', '*/access.log', 'app/.h*', 'web/access.log', 'none/*']:
+            pattern = os.path.join(self.directory, pattern)
+            self.assertEqual(sorted(self.index.glob(pattern)), sorted(glob.glob(pattern)))
+
+    def test_new_files_are_found(self):
+        print('GlobIndex - test_new_files_are_found:')
+        pattern = os.path.join(self.directory, 'app/*.log')
+        self.assertEqual(len(self.index.glob(pattern)), 2)
+        open(os.path.join(self.directory, 'app/worker-3.log'), 'w').close()
+        self.assertEqual(len(self.index.glob(pattern)), 3)
+
+    def test_newest(self):
+        print('GlobIndex - test_newest:')
+        newest = os.path.join(self.directory, 'app/worker-1.log')
+        os.utime(newest, (time.time() + 10, time.time() + 10))
+        self.assertEqual(self.index.newest(os.path.join(self.directory, 'app/*.log')), newest)
+        self.assertEqual(self.index.newest(os.path.join(self.directory, 'app/*.txt')), None)
+
+    def test_removed_directory_is_forgotten(self):
+        print('GlobIndex - test_removed_directory_is_forgotten:')
+        notifier = FakeNotifier()
+        self.index.watch(notifier)
+        app = os.path.join(self.directory, 'app')
+        self.assertEqual(len(self.index.glob(os.path.join(app, '*.log'))), 2)
+        self.assertEqual(notifier.watches.values(), [app])
+        shutil.rmtree(app)
+        self.index.notify(glob_index.IN_Q_OVERFLOW)
+        self.assertEqual(self.index.glob(os.path.join(app, '*.log')), [])
+        self.assertFalse(app in self.index._dirs)
+        self.assertEqual(notifier.watches, {})
+
+    def test_prune(self):
+        print('GlobIndex - test_prune:')
+        pattern = os.path.join(self.directory, '*/*.log')
+        self.index.newest(pattern)
+        self.assertEqual(len(self.index._mtimes), 3)
+        shutil.rmtree(os.path.join(self.directory, 'web'))
+        self.index._pruned -= glob_index.PRUNE_INTERVAL
+        time.sleep(glob_index.STAT_TTL)
+        self.assertEqual(self.index.newest(os.path.join(self.directory, 'app/none')), None)
+        self.assertEqual(self.index._mtimes, {})
+        self.assertEqual(self.index._newest.keys(), [os.path.join(self.directory, 'app/none')])
+        self.assertFalse(os.path.join(self.directory, 'web') in self.index._dirs)
+
+
+if __name__ == '__main__':
+    unittest.main()
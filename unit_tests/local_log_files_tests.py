@@ -0,0 +1,87 @@
+import unittest
+import os
+import shutil
+import time
+from src.s3_archiving_backend import AmazonS3ArchivingBackend, ARCHIVING_BACKEND_BASE_DIRECTORY, \
+    LOCAL_LOG_BUFFER_SIZE, LOCAL_LOG_FLUSH_PERIOD
+
+TOKEN = 'local-log-files-test'
+LOG_NAME = 'test.log'
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = AmazonS3ArchivingBackend(no_timestamps=True, no_logs_compressing=True, die_on_errors=False)
+        self.backend.is_enabled = True
+
+    def tearDown(self):
+        self.backend.shutdown()
+        for log_object in self.backend.logs_map.values():
+            if os.path.exists(log_object['local_log_file']):
+                os.remove(log_object['local_log_file'])
+        shutil.rmtree(ARCHIVING_BACKEND_BASE_DIRECTORY + TOKEN, True)
+
+    def stopped(self):
+        """Stops the worker so that handles can be used from the test."""
+        self.backend.shutdown()
+        self.backend.add_to_local_logs_map(LOG_NAME, TOKEN)
+        return self.backend.logs_map[LOG_NAME]
+
+    def size_on_disk(self, log_object):
+        return os.path.getsize(log_object['local_log_file'])
+
+    def test_flush_by_size(self):
+        print('LocalLogFiles - test_flush_by_size:')
+        log_object = self.stopped()
+        self.backend.flush_data_to_local_log_file(LOG_NAME, 'a' * 100)
+        fd = log_object['fd']
+        self.assertTrue(fd is not None)
+        self.assertEqual(self.size_on_disk(log_object), 0)
+        self.backend.flush_data_to_local_log_file(LOG_NAME, 'b' * LOCAL_LOG_BUFFER_SIZE)
+        self.assertTrue(log_object['fd'] is fd)
+        self.assertEqual(self.size_on_disk(log_object), 100 + LOCAL_LOG_BUFFER_SIZE)
+
+    def test_flush_by_time(self):
+        print('LocalLogFiles - test_flush_by_time:')
+        log_object = self.stopped()
+        self.backend.flush_data_to_local_log_file(LOG_NAME, 'a' * 100)
+        self.backend.flush_local_log_files(time.time() - LOCAL_LOG_FLUSH_PERIOD)
+        self.assertEqual(self.size_on_disk(log_object), 0)
+        self.backend.flush_local_log_files(time.time() + LOCAL_LOG_FLUSH_PERIOD)
+        self.assertEqual(self.size_on_disk(log_object), 100)
+
+    def test_reopen_after_rotation(self):
+        print('LocalLogFiles - test_reopen_after_rotation:')
+        log_object = self.stopped()
+        self.backend.flush_data_to_local_log_file(LOG_NAME, 'before\n')
+        self.assertTrue(self.backend.rotate_log(log_object, LOG_NAME))
+        self.assertTrue(log_object['fd'] is None)
+        rotated = os.listdir(ARCHIVING_BACKEND_BASE_DIRECTORY + TOKEN)
+        self.assertEqual(len(rotated), 1)
+        with open(os.path.join(ARCHIVING_BACKEND_BASE_DIRECTORY + TOKEN, rotated[0])) as f:
+            self.assertEqual(f.read(), 'before\n')
+        self.backend.flush_data_to_local_log_file(LOG_NAME, 'after\n')
+        self.assertTrue(log_object['fd'] is not None)
+        self.backend.close_local_log_files()
+        with open(log_object['local_log_file']) as f:
+            self.assertEqual(f.read(), 'after\n')
+
+    def test_close_on_shutdown(self):
+        print('LocalLogFiles - test_close_on_shutdown:')
+        self.backend.put_data_to_local_log(LOG_NAME, TOKEN, 'line\n')
+        for i in range(100):
+            log_object = self.backend.logs_map[LOG_NAME]
+            if log_object['fd'] is not None:
+                break
+            time.sleep(0.01)
+        self.assertTrue(log_object['fd'] is not None)
+        self.backend.shutdown()
+        self.assertFalse(self.backend.data_queue_thread.is_alive())
+        self.assertTrue(log_object['fd'] is None)
+        with open(log_object['local_log_file']) as f:
+            self.assertEqual(f.read(), 'line\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
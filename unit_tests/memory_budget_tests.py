@@ -0,0 +1,38 @@
+import unittest
+import threading
+import time
+from src.memory_budget import MemoryBudget, ENTRY_OVERHEAD
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def test_limit(self):
+        print('MemoryBudget - test_limit:')
+        budget = MemoryBudget(2 * (100 + ENTRY_OVERHEAD))
+        self.assertTrue(budget.acquire(100))
+        self.assertTrue(budget.acquire(100))
+        self.assertFalse(budget.acquire(1))
+        budget.release(100)
+        self.assertTrue(budget.acquire(50))
+        self.assertEqual(budget.used(), 150 + 2 * ENTRY_OVERHEAD)
+
+    def test_large_entry(self):
+        print('MemoryBudget - test_large_entry:')
+        budget = MemoryBudget(100)
+        self.assertTrue(budget.acquire(1000))
+        self.assertFalse(budget.acquire(1))
+
+    def test_wait(self):
+        print('MemoryBudget - test_wait:')
+        budget = MemoryBudget(100 + ENTRY_OVERHEAD)
+        budget.acquire(100)
+        timer = threading.Timer(0.1, budget.release, (100,))
+        timer.start()
+        started = time.time()
+        self.assertTrue(budget.acquire(100, 5))
+        self.assertTrue(time.time() - started < 5)
+        timer.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import re
+import ConfigParser
+from src.multiline import *
+from src.multiline import LINE_SEPARATOR
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    TRACEBACK = ['2016-01-01 ERROR failed\n',
+                 'Traceback (most recent call last):\n',
+                 '  File "x.py", line 1, in <module>\n',
+                 'ValueError\n',
+                 '2016-01-01 INFO next\n']
+
+    def test_start_pattern(self):
+        print('MultilineAssembler - test_start_pattern:')
+        assembler = MultilineAssembler(re.compile(r'\d{4}-'), 500, 65536, 1)
+        events = assembler.feed(self.TRACEBACK)
+        self.assertEqual(events, [LINE_SEPARATOR.join([x.rstrip('\n') for x in self.TRACEBACK[:4]]) + '\n'])
+        self.assertEqual(assembler.pending(), len(self.TRACEBACK[4]))
+        self.assertEqual(assembler.flush(True), [self.TRACEBACK[4]])
+        self.assertEqual(assembler.flush(True), [])
+
+    def test_indentation(self):
+        print('MultilineAssembler - test_indentation:')
+        assembler = MultilineAssembler(None, 500, 65536, 1)
+        events = assembler.feed(['Exception in thread\n', '\tat A\n', '    at B\n', 'Next\n'])
+        self.assertEqual(events, ['Exception in thread' + LINE_SEPARATOR + '\tat A' + LINE_SEPARATOR + '    at B\n'])
+
+    def test_limits(self):
+        print('MultilineAssembler - test_limits:')
+        assembler = MultilineAssembler(None, 2, 65536, 1)
+        self.assertEqual(len(assembler.feed(['a\n', ' b\n', ' c\n', ' d\n', ' e\n'])), 2)
+        assembler = MultilineAssembler(None, 500, 10, 1)
+        self.assertEqual(len(assembler.feed(['aaaa\n', ' bbbb\n', ' c\n'])), 1)
+
+    def test_timeout(self):
+        print('MultilineAssembler - test_timeout:')
+        assembler = MultilineAssembler(None, 500, 65536, 0)
+        assembler.feed(['a\n', ' b\n'])
+        self.assertEqual(len(assembler.flush()), 1)
+
+    def test_config(self):
+        print('MultilineConfig - test_config:')
+        conf = ConfigParser.SafeConfigParser()
+        conf.add_section('app')
+        config = MultilineConfig()
+        config.load(conf, 'app')
+        self.assertFalse(config.enabled())
+        conf.set('app', 'multiline-start', '[')
+        self.assertRaises(ValueError, config.load, conf, 'app')
+        conf.set('app', 'multiline-start', r'^\d')
+        config.load(conf, 'app')
+        self.assertTrue(config.enabled())
+
+
+if __name__ == '__main__':
+    unittest.main()
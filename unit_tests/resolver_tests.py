@@ -0,0 +1,50 @@
+import unittest
+import socket
+import time
+from src.resolver import AddressCache
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.results = [['10.0.0.1', '10.0.0.2']]
+        self.calls = 0
+
+    def resolve(self, host, port):
+        self.calls += 1
+        result = self.results[0]
+        if len(self.results) > 1:
+            self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def test_cached(self):
+        print('AddressCache - test_cached:')
+        cache = AddressCache(60, self.resolve)
+        self.assertEqual(cache.lookup('example.com', 443), ['10.0.0.1', '10.0.0.2'])
+        self.assertEqual(cache.lookup('example.com', 443), ['10.0.0.1', '10.0.0.2'])
+        self.assertEqual(self.calls, 1)
+
+    def test_refresh(self):
+        print('AddressCache - test_refresh:')
+        cache = AddressCache(0, self.resolve)
+        cache.lookup('example.com', 443)
+        self.results = [['10.0.0.3']]
+        # Expired addresses are returned while refreshing in background
+        self.assertEqual(cache.lookup('example.com', 443), ['10.0.0.1', '10.0.0.2'])
+        for i in range(100):
+            if cache.lookup('example.com', 443) == ['10.0.0.3']:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.lookup('example.com', 443), ['10.0.0.3'])
+
+    def test_failure(self):
+        print('AddressCache - test_failure:')
+        self.results = [socket.gaierror(socket.EAI_NONAME, 'unknown')]
+        cache = AddressCache(60, self.resolve)
+        self.assertRaises(socket.error, cache.lookup, 'example.com', 443)
+
+
+if __name__ == '__main__':
+    unittest.main()
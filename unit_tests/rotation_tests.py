@@ -0,0 +1,66 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from src import le
+
+
+class FakeTransport(object):
+
+    def __init__(self):
+        self.lines = []
+
+    def send_block(self, entries, block=False, ack=None):
+        self.lines.extend(entries.splitlines(True))
+        if ack:
+            ack()
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'app.log')
+        self.transport = FakeTransport()
+        self.follower = None
+
+    def tearDown(self):
+        if self.follower:
+            self.follower.close()
+        shutil.rmtree(self.directory)
+
+    def append(self, path, data):
+        f = open(path, 'a')
+        f.write(data)
+        f.close()
+
+    def wait_for(self, count, timeout=5):
+        deadline = time.time() + timeout
+        while len(self.transport.lines) < count and time.time() < deadline:
+            time.sleep(0.05)
+        return self.transport.lines
+
+    def test_renamed_file_is_drained(self):
+        print('Rotation - test_renamed_file_is_drained:')
+        self.append(self.path, 'first\n')
+        self.follower = le.Follower(self.path, le.filter_events, self.transport, le.formatters.FormatPlain(''),
+                                    from_beginning=True)
+        self.assertEqual(self.wait_for(1), ['first\n'])
+
+        # The writer keeps the renamed file open for a while after the new one appears
+        writer = open(self.path, 'a')
+        os.rename(self.path, self.path + '.1')
+        self.append(self.path, 'new\n')
+        time.sleep(le.NAME_CHECK * le.TAIL_RECHECK + 0.5)
+        writer.write('late\nhalf')
+        writer.flush()
+        time.sleep(0.5)
+        writer.write(' line\n')
+        writer.close()
+
+        self.assertEqual(self.wait_for(4, le.RENAME_GRACE + 5), ['first\n', 'late\n', 'half line\n', 'new\n'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import threading
+from src.scheduler import Scheduler
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.calls = []
+        self.done = threading.Event()
+
+    def tearDown(self):
+        self.scheduler.close()
+
+    def call(self, name):
+        self.calls.append(name)
+        if name == 'last':
+            self.done.set()
+
+    def test_order(self):
+        print('Scheduler - test_order:')
+        self.scheduler.call_later(0.2, self.call, ('last',))
+        self.scheduler.call_later(0.1, self.call, ('second',))
+        self.scheduler.call_later(0, self.call, ('first',))
+        self.done.wait(5)
+        self.assertEqual(self.calls, ['first', 'second', 'last'])
+
+    def test_cancel(self):
+        print('Scheduler - test_cancel:')
+        timer = self.scheduler.call_later(0.05, self.call, ('cancelled',))
+        timer.cancel()
+        self.scheduler.call_later(0.1, self.call, ('last',))
+        self.done.wait(5)
+        self.assertEqual(self.calls, ['last'])
+
+
+if __name__ == '__main__':
+    unittest.main()
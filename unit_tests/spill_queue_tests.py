@@ -0,0 +1,58 @@
+import unittest
+import os
+import shutil
+import tempfile
+from src.spill_queue import SpillQueue
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_order(self):
+        print('SpillQueue - test_order:')
+        q = SpillQueue(self.directory, 1 << 20, 32, 1)
+        self.assertTrue(q.empty())
+        entries = ['entry %d\n' % x for x in range(20)]
+        for entry in entries[:10]:
+            q.put(entry)
+        self.assertFalse(q.empty())
+        self.assertEqual([q.get() for x in range(5)], entries[:5])
+        for entry in entries[10:]:
+            q.put(entry)
+        self.assertEqual([q.get() for x in range(15)], entries[5:])
+        self.assertEqual(q.get(), None)
+        self.assertTrue(q.empty())
+        q.close()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_max_size(self):
+        print('SpillQueue - test_max_size:')
+        q = SpillQueue(self.directory, 100, 50, 1)
+        for x in range(20):
+            q.put('entry %02d\n' % x)
+        self.assertEqual(q.get(), 'entry 16\n')
+        q.close()
+
+    def test_reopen(self):
+        print('SpillQueue - test_reopen:')
+        q = SpillQueue(self.directory, 1 << 20, 32, 1)
+        for x in range(6):
+            q.put('entry %d\n' % x)
+        self.assertEqual(q.get(), 'entry 0\n')
+        q.put_front(['front\n'])
+        q.close()
+
+        q = SpillQueue(self.directory, 1 << 20, 32, 1)
+        q.put('entry 6\n')
+        self.assertEqual([q.get() for x in range(8)],
+                         ['front\n'] + ['entry %d\n' % x for x in range(1, 7)] + [None])
+        q.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
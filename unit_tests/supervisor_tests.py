@@ -0,0 +1,71 @@
+import unittest
+import os
+import shutil
+import signal
+import tempfile
+import time
+from src import supervisor
+from src.supervisor import Supervisor, Progress
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.starts = os.path.join(self.directory, 'starts')
+        self.interval = supervisor.HEARTBEAT_INTERVAL
+        supervisor.HEARTBEAT_INTERVAL = 0.1
+
+    def tearDown(self):
+        supervisor.HEARTBEAT_INTERVAL = self.interval
+        shutil.rmtree(self.directory)
+
+    def supervise(self, probe, duration):
+        """Runs a worker which registers a loop with the probe for the
+        duration. Returns the number of times the worker has been started."""
+        progress = Progress()
+
+        def target(index):
+            f = open(self.starts, 'a')
+            f.write('%d\n' % os.getpid())
+            f.close()
+            progress.register('loop', probe)
+            while True:
+                time.sleep(1)
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                Supervisor(1, target, 1, progress).run()
+            finally:
+                os._exit(0)
+        time.sleep(duration)
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+        return len(open(self.starts).readlines())
+
+    def test_hung_worker_is_restarted(self):
+        print('Supervisor - test_hung_worker_is_restarted:')
+        # The loop never answers its probe
+        self.assertTrue(self.supervise(lambda tick: None, 4) >= 2)
+
+    def test_progressing_worker_is_kept(self):
+        print('Supervisor - test_progressing_worker_is_kept:')
+        self.assertEqual(self.supervise(lambda tick: tick(), 4), 1)
+
+    def test_progress(self):
+        print('Supervisor - test_progress:')
+        progress = Progress()
+        ticks = []
+        progress.register('loop', ticks.append)
+        self.assertEqual(progress.check(), [])
+        self.assertEqual(len(ticks), 1)
+        self.assertEqual(progress.check(), ['loop'])
+        self.assertEqual(len(ticks), 1)
+        ticks[0]()
+        self.assertEqual(progress.check(), [])
+        self.assertEqual(len(ticks), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()